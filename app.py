@@ -1,11 +1,143 @@
-from flask import Flask, render_template, request, redirect, url_for
+from flask import Flask, Response, abort, g, jsonify, render_template, request, redirect, send_file, url_for
 import zelda_functions as utl
+import functools
+import hmac
 import json
-import plotly.express as px
-import plotly
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import quote
+import hyrule_metrics as metrics
+from hyrule_cache import TieredCache
+from hyrule_cooking import MAX_INGREDIENTS, CookingIndex, describe_dish
+from hyrule_index import FILTER_FIELDS, RANGE_FIELDS, CompendiumIndex, QueryIndex, SearchEngine, normalize_key
+from image_cache import ImageCache
+
+DATASET_FILEPATH = 'hyrule_retrieved.json'
+CACHE_MAX_SIZE = 1024
+CACHE_TTL = 7 * 24 * 60 * 60  # seconds an entry may be served at all
+CACHE_STALE_AFTER = 24 * 60 * 60  # seconds after which an entry is refreshed in the background
+NEGATIVE_CACHE_TTL = 5 * 60  # seconds an unknown item name is remembered
+MAX_ALTERNATIVES = 10
+IMAGE_MAX_AGE = 30 * 24 * 60 * 60  # seconds browsers may reuse a proxied image
+CHART_CACHE_SIZE = 256
+# Colours of Plotly's default template, so prebuilt charts look like plotly.express ones.
+PIE_COLORWAY = ['#636efa', '#EF553B', '#00cc96', '#ab63fa', '#FFA15A',
+                '#19d3f3', '#FF6692', '#B6E880', '#FF97FF', '#FECB52']
+QUERY_DEFAULT_LIMIT = 20
+QUERY_MAX_LIMIT = 100
+PROFILING_TOKEN = os.environ.get('HYRULE_PROFILING_TOKEN')  # /profiling is disabled unless this is set
+MAX_BATCH_SIZE = 50
+COMPARABLE_CATEGORIES = ('equipment', 'materials')
+COMPARISON_COLUMNS = ('attack', 'defense', 'hearts_recovered', 'fuse_attack_power')
 
 app = Flask(__name__)
-cache = utl.create_cache(utl.CACHE_FILEPATH)
+cache = TieredCache(utl.create_cache(utl.CACHE_FILEPATH, ttl=CACHE_TTL, legacy_filepath=utl.LEGACY_CACHE_FILEPATH),
+                    max_size=CACHE_MAX_SIZE, ttl=CACHE_TTL, stale_after=CACHE_STALE_AFTER,
+                    refresh=lambda key: utl.fetch_item_from_api(key)[0],
+                    negative_ttl=NEGATIVE_CACHE_TTL)
+
+
+def load_indexes(dataset_filepath=DATASET_FILEPATH):
+    """Builds the lookup, search, query and cooking indexes over the local dataset.
+
+    Returns:
+        tuple: (CompendiumIndex, SearchEngine, QueryIndex, CookingIndex)
+    """
+
+    try:
+        entries = list(utl.read_json(dataset_filepath).values())
+    except FileNotFoundError:
+        entries = []
+    return CompendiumIndex(entries), SearchEngine(entries), QueryIndex(entries), CookingIndex(entries)
+
+
+LocalIndexes = namedtuple('LocalIndexes', 'mtime index search_engine query_index cooking_index')
+
+
+class DatasetIndexes:
+    """The indexes returned by < load_indexes >, built on first use and rebuilt when the
+    modification time of < filepath > changes, e.g. after 'python final_project.py' fetched
+    or synced the dataset. Like < zelda_functions.HeartTable >, the indexes are published
+    together as one immutable < LocalIndexes >, so a request never mixes old and new ones.
+
+    Parameters:
+        filepath (str): path to the dataset keyed by entry ID
+    """
+
+    def __init__(self, filepath=DATASET_FILEPATH):
+        self.filepath = filepath
+        self.state = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Returns the current indexes, rebuilding them if the dataset file changed.
+
+        Returns:
+            LocalIndexes: the indexes and the modification time they were built from
+        """
+
+        try:
+            mtime = os.stat(self.filepath).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        state = self.state
+        if state is not None and state.mtime == mtime:
+            return state
+        with self._lock:
+            state = self.state
+            if state is not None and state.mtime == mtime:
+                return state
+            self.state = LocalIndexes(mtime, *load_indexes(self.filepath))
+            return self.state
+
+# Local entries are answered by the lookup index before the item cache is consulted, so
+# the cache is not warmed with them.
+indexes = DatasetIndexes()
+image_cache = ImageCache()
+metrics.registry.register_collector(metrics.cache_collector('items', cache.stats))
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    g.profile = metrics.profiler.start()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.REQUEST_DURATION.observe(time.perf_counter() - g.request_start, route=route, method=request.method,
+                                     status=response.status_code)
+    return response
+
+@app.teardown_request
+def stop_request_profile(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        metrics.profiler.stop(profile, request.endpoint or 'unmatched')
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/profiling', methods=['GET', 'POST'])
+def profiling():
+    """Shows the profiler state, and switches it on or off with a POST of enabled=true or
+    enabled=false. Only available when < PROFILING_TOKEN > is set, to requests sending it
+    in an X-Profiling-Token header; the client address is not checked, since behind a
+    reverse proxy every client appears to be local.
+    """
+
+    if not PROFILING_TOKEN:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('X-Profiling-Token', '').encode(), PROFILING_TOKEN.encode()):
+        abort(403)
+    if request.method == 'POST':
+        metrics.profiler.enabled = request.values.get('enabled', '').lower() in ('1', 'true', 'on', 'yes')
+    return jsonify(enabled=metrics.profiler.enabled, directory=metrics.profiler.directory,
+                   dumps=metrics.profiler.dumps()[:50])
 
 @app.route('/', methods=['GET', 'POST'])
 def welcome():
@@ -23,14 +155,185 @@ def welcome():
 def search_item():
     if request.method == 'POST':
         item_name = request.form['item_name']
-        item_data = utl.fetch_item_details(item_name, cache, utl.CACHE_FILEPATH)
+        item_data = indexes.refresh().index.lookup(item_name)
+        if item_data:
+            metrics.ITEM_LOOKUPS.inc(source='index')
+        else:
+            item_data = utl.fetch_item_details(item_name, cache, utl.CACHE_FILEPATH)
 
         if item_data:
             return render_template('item_result.html', item=item_data)
         else:
-            return render_template('search_item.html', error="Item not found.")
+            search_engine = indexes.refresh().search_engine
+            suggestions = [result['name'] for result in search_engine.search(item_name, limit=5)]
+            return render_template('search_item.html', error="Item not found.", suggestions=suggestions)
     return render_template('search_item.html')
 
+@app.route('/image/<key>')
+def item_image(key):
+    # Only images of local entries are proxied; any other key is left to the upstream
+    # host, so unknown keys never cost this worker a download.
+    entry = indexes.refresh().index.lookup(key)
+    if entry is None:
+        return redirect(utl.HYRULE_IMAGE.format(quote(key, safe='')))
+    if not entry.get('image'):
+        abort(404)
+    record = image_cache.get(entry['image'])
+    if record is None:
+        return redirect(entry['image'])
+    return send_file(record['path'], mimetype=record['content_type'], etag=record['digest'],
+                     last_modified=record['last_modified'], max_age=IMAGE_MAX_AGE, conditional=True)
+
+@app.route('/autocomplete')
+def autocomplete():
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+    search_engine = indexes.refresh().search_engine
+    return jsonify(query=query, results=search_engine.search(query, limit=max(1, min(limit, 50))))
+
+def parse_query_args(args):
+    """Reads the filters and page of a /query request. Value filters may be repeated
+    (e.g. ?location=Hyrule Field&location=Akkala Highlands matches either location), and
+    ranges are given as min_<name>/max_<name>. Raises ValueError with a user-facing
+    message for invalid input.
+
+    Returns:
+        tuple: (filters, ranges, offset, limit) as accepted by < QueryIndex.query >
+    """
+
+    unknown = set(args) - set(FILTER_FIELDS) - {f"{bound}_{name}" for name in RANGE_FIELDS
+                                                for bound in ('min', 'max')} - {'offset', 'limit'}
+    if unknown:
+        raise ValueError(f"Unknown query parameters: {', '.join(sorted(unknown))}")
+    filters = {name: args.getlist(name) for name in FILTER_FIELDS if args.getlist(name)}
+    ranges = {}
+    try:
+        for name in RANGE_FIELDS:
+            low, high = args.get(f"min_{name}"), args.get(f"max_{name}")
+            if low is not None or high is not None:
+                ranges[name] = (None if low is None else float(low), None if high is None else float(high))
+                if not all(math.isfinite(bound) for bound in ranges[name] if bound is not None):
+                    raise ValueError(f"{name} range is not finite")
+        offset = int(args.get('offset', 0))
+        limit = int(args.get('limit', QUERY_DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError("Ranges must be numbers, and offset and limit whole numbers.")
+    if offset < 0 or limit < 1:
+        raise ValueError("Offset must be at least 0 and limit at least 1.")
+    return filters, ranges, offset, min(limit, QUERY_MAX_LIMIT)
+
+@app.route('/query')
+def query():
+    try:
+        filters, ranges, offset, limit = parse_query_args(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    page = indexes.refresh().query_index.query(filters, ranges, offset, limit)
+    next_offset = offset + limit
+    page['next_offset'] = next_offset if next_offset < page['total'] else None
+    return jsonify(page)
+
+def parse_item_keys(values):
+    """Splits the names or IDs of a batch lookup, given as repeated values and/or separated
+    by commas or new lines, and drops duplicates (compared like < normalize_key >). Raises
+    ValueError with a user-facing message for an empty or oversized batch.
+
+    Returns:
+        list: distinct keys in the order they were given
+    """
+
+    keys = {}
+    for value in values:
+        for key in str(value).replace('\n', ',').split(','):
+            if key.strip():
+                keys.setdefault(normalize_key(key), key.strip())
+    if not keys:
+        raise ValueError("Please enter at least one item name or ID.")
+    if len(keys) > MAX_BATCH_SIZE:
+        raise ValueError(f"Please look up at most {MAX_BATCH_SIZE} items at a time.")
+    return list(keys.values())
+
+def parse_item_payload(payload):
+    """Reads the keys of a JSON batch lookup, which must be an object {"keys": [...]}
+    listing names (strings) or IDs (integers). Raises ValueError with a user-facing
+    message for any other payload.
+
+    Returns:
+        list: the keys as strings
+    """
+
+    keys = payload.get('keys') if isinstance(payload, dict) else None
+    if not isinstance(keys, list) or not all(isinstance(key, (str, int)) and not isinstance(key, bool)
+                                             for key in keys):
+        raise ValueError('Please send a JSON object {"keys": [...]} listing item names or IDs.')
+    return [str(key) for key in keys]
+
+def resolve_items(keys):
+    """Looks up every key in the local index, and the rest together with
+    < utl.fetch_items_details >.
+
+    Returns:
+        dict: each key mapped to its entry, or None if it was not found
+    """
+
+    index = indexes.refresh().index
+    results = {}
+    for key in keys:
+        results[key] = index.lookup(key)
+        if results[key]:
+            metrics.ITEM_LOOKUPS.inc(source='index')
+    misses = [key for key, entry in results.items() if not entry]
+    if misses:
+        results.update(utl.fetch_items_details(misses, cache, utl.CACHE_FILEPATH))
+    return results
+
+@app.route('/items', methods=['GET', 'POST'])
+def items():
+    """Batch lookup: ?key=<name or ID> repeated, or a JSON body {"keys": [...]}."""
+
+    values = request.args.getlist('key')
+    try:
+        if request.method == 'POST':
+            values = parse_item_payload(request.get_json(silent=True)) if request.is_json \
+                else request.form.getlist('key')
+        keys = parse_item_keys(values)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    results = resolve_items(keys)
+    return jsonify(results=[{'key': key, 'entry': entry} for key, entry in results.items()],
+                   not_found=[key for key, entry in results.items() if not entry])
+
+def comparison_row(entry):
+    properties = entry.get('properties') or {}
+    values = {
+        'attack': properties.get('attack'),
+        'defense': properties.get('defense'),
+        'hearts_recovered': entry.get('hearts_recovered'),
+        'fuse_attack_power': entry.get('fuse_attack_power'),
+    }
+    return {'id': entry['id'], 'name': entry['name'], 'category': entry['category'],
+            'values': {name: utl.convert_to_numeric(value) for name, value in values.items()}}
+
+@app.route('/compare', methods=['GET', 'POST'])
+def compare():
+    if request.method == 'GET':
+        return render_template('compare.html')
+    try:
+        keys = parse_item_keys([request.form.get('items', '')])
+    except ValueError as e:
+        return render_template('compare.html', error=str(e))
+    results = resolve_items(keys)
+    rows = [comparison_row(entry) for entry in results.values() if entry and entry['category'] in COMPARABLE_CATEGORIES]
+    best = {}
+    for column in COMPARISON_COLUMNS:
+        values = [row['values'][column] for row in rows if isinstance(row['values'][column], (int, float))]
+        best[column] = max(values) if len(values) > 1 and max(values) > 0 else None
+    return render_template('compare.html', items=request.form['items'], rows=rows, best=best,
+                           columns=COMPARISON_COLUMNS,
+                           not_found=[key for key, entry in results.items() if not entry],
+                           skipped=[entry['name'] for entry in results.values()
+                                    if entry and entry['category'] not in COMPARABLE_CATEGORIES])
+
 @app.route('/analysis_question', methods=['GET', 'POST'])
 def analysis_question():
     if request.method == 'POST':
@@ -64,38 +367,181 @@ def heart_recovery_input():
         hearts_needed_str = request.form.get('hearts_needed')
         if hearts_needed_str:
             try:
-                hearts_needed = float(hearts_needed_str)
-                combo_str, best_combo = utl.perform_local_analysis(hearts_needed)
-                if best_combo:
-                    return render_template('analysis_results.html', combo_str=combo_str, items=best_combo)
-                else:
-                    return render_template('error.html', message="No combination found.")
-            except ValueError:
-                return render_template('heart_recovery_input.html', error="Please enter a valid number.")
+                hearts_needed = parse_hearts_needed(hearts_needed_str)
+            except ValueError as e:
+                return render_template('heart_recovery_input.html', error=str(e))
+            combo_str, best_combo = utl.perform_local_analysis(hearts_needed)
+            if best_combo:
+                return render_template('analysis_results.html', combo_str=combo_str, items=best_combo)
+            else:
+                return render_template('error.html', message="No combination found.")
         else:
             return render_template('heart_recovery_input.html', error="Please enter the number of hearts.")
     return render_template('heart_recovery_input.html')
 
 
+def parse_hearts_needed(value):
+    """Reads a number of hearts from a form field. Raises ValueError with a user-facing
+    message unless it is a finite number accepted by < utl.check_hearts_needed >.
+    """
+
+    try:
+        hearts_needed = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("Please enter a valid number.")
+    utl.check_hearts_needed(hearts_needed)
+    return hearts_needed
+
+
+def parse_analysis_options(form):
+    """Reads the optional solver settings of the heart recovery form. Returns only the
+    options that differ from the defaults, so an empty dict means a plain analysis.
+    Raises ValueError with a user-facing message for invalid input.
+    """
+
+    options = {}
+    if form.get('mode') == 'exact':
+        options['exact'] = True
+    try:
+        if form.get('max_items', '').strip():
+            options['max_items'] = int(form['max_items'])
+        top_k = int(form.get('top_k', '').strip() or 1)
+        inventory = {}
+        for pair in filter(None, (part.strip() for part in form.get('inventory', '').split(','))):
+            name, count = pair.rsplit(':', 1)
+            inventory[name.strip()] = int(count)
+    except ValueError:
+        raise ValueError("Item limits, inventory counts and alternatives must be whole numbers.")
+    if top_k != 1:
+        options['top_k'] = max(1, min(top_k, MAX_ALTERNATIVES))
+    if inventory:
+        options['inventory'] = inventory
+    exclude = [name.strip() for name in form.get('exclude', '').split(',') if name.strip()]
+    if exclude:
+        options['exclude'] = exclude
+    return options
+
+
+def pie_figure(title, labels, values):
+    """Returns the Plotly figure of a pie chart as plain JSON-serializable data, equivalent
+    to px.pie(names=labels, values=values, title=title) without importing Plotly.
+    """
+
+    return {
+        'data': [{
+            'type': 'pie',
+            'labels': labels,
+            'values': values,
+            'domain': {'x': [0.0, 1.0], 'y': [0.0, 1.0]},
+            'hovertemplate': 'label=%{label}<br>value=%{value}<extra></extra>',
+            'legendgroup': '',
+            'name': '',
+            'showlegend': True,
+        }],
+        'layout': {'title': {'text': title}, 'legend': {'tracegroupgap': 0}, 'colorway': PIE_COLORWAY},
+    }
+
+@functools.lru_cache(maxsize=CHART_CACHE_SIZE)
+def heart_chart_json(hearts_needed, slices):
+    """Returns the figure JSON of the /perform_analysis pie chart, memoized per
+    (< hearts_needed >, < slices >) where < slices > is a tuple of (item name, hearts)
+    pairs. Charts with finite values use the prebuilt < pie_figure >; anything else falls
+    back to plotly.express, which is only imported then.
+    """
+
+    title = f"Heart Recovery Items Distribution for {hearts_needed} Hearts"
+    labels = [name for name, _ in slices]
+    values = [hearts for _, hearts in slices]
+    if all(isinstance(value, (int, float)) and math.isfinite(value) for value in values):
+        return json.dumps(pie_figure(title, labels, values))
+
+    import plotly
+    import plotly.express as px
+
+    fig = px.pie(names=labels, values=values, title=title)
+    return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+
+def chart_cache_stats():
+    info = heart_chart_json.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}
+
+metrics.registry.register_collector(metrics.cache_collector('charts', chart_cache_stats))
+
+
 @app.route('/perform_analysis', methods=['POST'])
 def perform_analysis():
     hearts_needed_str = request.form.get('hearts_needed')
     try:
-        hearts_needed = float(hearts_needed_str)
+        hearts_needed = parse_hearts_needed(hearts_needed_str)
+        options = parse_analysis_options(request.form)
+    except ValueError as e:
+        return render_template('heart_recovery_input.html', error=str(e))
+
+    if options:
+        results = utl.perform_heart_query(hearts_needed, **options)
+    else:
         combo_str, best_combo = utl.perform_local_analysis(hearts_needed)
-        if best_combo:
-            labels = [item['name'] for item in best_combo]
-            values = [item['hearts_recovered'] for item in best_combo]
+        results = [(combo_str, best_combo)] if best_combo else []
 
-            # Create a pie chart
-            fig = px.pie(names=labels, values=values, title=f"Heart Recovery Items Distribution for {hearts_needed} Hearts")
-            graph_json = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+    if results:
+        combo_str, best_combo = results[0]
+        slices = tuple((item['name'], item['hearts_recovered']) for item in best_combo)
+        graph_json = heart_chart_json(hearts_needed, slices)
 
-            return render_template('analysis_results.html', combo_str=combo_str, items=best_combo, graph_json=graph_json)
-        else:
-            return render_template('error.html', message="No combination found.")
-    except ValueError:
-        return render_template('heart_recovery_input.html', error="Please enter a valid number.")
+        return render_template('analysis_results.html', combo_str=combo_str, items=best_combo, graph_json=graph_json,
+                               alternatives=[description for description, _ in results[1:]])
+    else:
+        return render_template('error.html', message="No combination found.")
+
+
+def parse_cooking_options(form):
+    """Reads the /cook form into keyword arguments for < CookingIndex.cook >. The hearts
+    target is optional (blank maximizes hearts), and the other fields are read like the
+    heart recovery form by < parse_analysis_options >. Raises ValueError with a
+    user-facing message for invalid input.
+    """
+
+    options = parse_analysis_options(form)
+    options['max_ingredients'] = options.pop('max_items', MAX_INGREDIENTS)
+    if not 1 <= options['max_ingredients'] <= MAX_INGREDIENTS:
+        raise ValueError(f"A dish holds between 1 and {MAX_INGREDIENTS} ingredients.")
+    hearts_needed = form.get('hearts_needed', '').strip()
+    if hearts_needed:
+        try:
+            options['hearts_needed'] = float(hearts_needed)
+        except ValueError:
+            raise ValueError("Please enter a valid number of hearts.")
+        utl.check_hearts_needed(options['hearts_needed'])
+    elif options.get('exact'):
+        raise ValueError("Please enter the number of hearts the dish must recover exactly.")
+    effect = form.get('effect', '').strip().lower()
+    if effect and effect not in indexes.refresh().cooking_index.effects():
+        raise ValueError(f"Unknown cooking effect: {effect}.")
+    options['effect'] = effect or None
+    options['only_inventory'] = form.get('only_inventory') == 'on'
+    if options['only_inventory'] and not options.get('inventory'):
+        raise ValueError("Please list the ingredients in your inventory.")
+    return options
+
+@app.route('/cook', methods=['GET', 'POST'])
+def cook():
+    cooking_index = indexes.refresh().cooking_index
+    if request.method == 'GET':
+        return render_template('cooking_input.html', effects=cooking_index.effects())
+    try:
+        options = parse_cooking_options(request.form)
+    except ValueError as e:
+        return render_template('cooking_input.html', effects=cooking_index.effects(), error=str(e))
+
+    dishes = cooking_index.cook(**options)
+    if not dishes:
+        return render_template('error.html', message="No dish found.")
+    dish = dishes[0]
+    slices = tuple((item['name'], item['hearts_recovered']) for item in dish['ingredients'])
+    graph_json = heart_chart_json(options.get('hearts_needed', dish['hearts']), slices)
+    return render_template('cooking_results.html', dish=dish, description=describe_dish(dish), graph_json=graph_json,
+                           alternatives=[describe_dish(alternative) for alternative in dishes[1:]])
 
 
 if __name__ == '__main__':
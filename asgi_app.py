@@ -0,0 +1,206 @@
+"""Async (ASGI) serving mode for the Hyrule Compendium web app.
+
+Routes that may have to call the remote compendium API (/search_item and /autocomplete)
+are served by a Quart app whose handlers await a non-blocking httpx client, so a slow
+upstream no longer ties up a worker thread per request. Identical lookups that are
+already in flight are coalesced into a single upstream request, and the number of
+concurrent upstream requests is capped. Every other route is the regular Flask app from
+'app.py', run through asgiref's WSGI adapter.
+
+Requires the optional packages quart, httpx and asgiref. Run with:
+    hypercorn asgi_app:asgi_app
+"""
+
+import asyncio
+import time
+
+import httpx
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, g, jsonify, render_template, request
+
+import app as wsgi
+import hyrule_metrics as metrics
+import zelda_functions as utl
+
+UPSTREAM_CONCURRENCY = 20
+UPSTREAM_TIMEOUT = 30  # seconds
+ASYNC_PATHS = ('/search_item', '/autocomplete')
+
+
+class AsyncCompendiumClient:
+    """Non-blocking client for the compendium API with single-flight coalescing of item
+    lookups and upstream requests, and a cap on concurrent upstream requests.
+
+    Parameters:
+        max_concurrency (int): maximum number of upstream requests in flight
+        timeout (float): timeout for each upstream request in seconds
+    """
+
+    def __init__(self, max_concurrency=UPSTREAM_CONCURRENCY, timeout=UPSTREAM_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self._client = None
+        self._semaphore = None
+        self._in_flight = {}
+
+    async def request_json(self, url):
+        """Async counterpart of < zelda_functions.request_json >. Concurrent calls for the
+        same < url > share one upstream request, and failures count against the shared
+        < zelda_functions.upstream_breaker >.
+
+        Returns:
+            tuple: (decoded JSON or None, status) where status is 'ok', 'not_found' or 'error'
+        """
+
+        return await self._single_flight(('url', url), lambda: self._get(url))
+
+    async def fetch_item_details(self, item_name, cache):
+        """Async counterpart of < zelda_functions.fetch_item_details >. Concurrent lookups
+        of the same < item_name > share one lookup, which stays in flight until the fetched
+        item has been written to < cache >, so no lookup can miss the cache in between.
+        Reads and writes of < cache > may reach its persistent store (a file or database),
+        so they run in a worker thread instead of blocking the event loop.
+        """
+
+        return await self._single_flight(('item', item_name), lambda: self._fetch_item_details(item_name, cache))
+
+    async def _fetch_item_details(self, item_name, cache):
+        cached = await asyncio.to_thread(cache.get, item_name)
+        if cached is not None:
+            metrics.ITEM_LOOKUPS.inc(source='cache')
+            return cached
+        if hasattr(cache, 'is_missing') and cache.is_missing(item_name):
+            metrics.ITEM_LOOKUPS.inc(source='negative_cache')
+            return None
+
+        response, status = await self.request_json(f"{utl.HYRULE_ENTRY}{item_name}")
+        metrics.ITEM_LOOKUPS.inc(source=f"upstream_{status}")
+        if status == 'ok' and response and response.get('data'):
+            item_data = utl.normalize_item_data(response['data'])
+            await asyncio.to_thread(cache.__setitem__, item_name, item_data)
+            return item_data
+        if status != 'error' and hasattr(cache, 'mark_missing'):
+            await asyncio.to_thread(cache.mark_missing, item_name)
+        return None
+
+    async def _single_flight(self, key, start):
+        # Runs the coroutine returned by start() unless one for < key > is already in
+        # flight, in which case its result is awaited instead. Shielded, so a cancelled
+        # caller does not cancel the work shared with other callers.
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(start())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get(self, url):
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_concurrency)
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        breaker = utl.upstream_breaker
+        if not breaker.allow():
+            metrics.record_upstream('circuit_open', 0)
+            return None, 'error'
+        start = time.perf_counter()
+        try:
+            async with self._semaphore:
+                self.upstream_calls += 1
+                start = time.perf_counter()
+                response = await self._client.get(url)
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    breaker.record_success()
+                    metrics.record_upstream('not_found', time.perf_counter() - start)
+                    return None, 'not_found'
+                response.raise_for_status()
+                payload = utl.json_object(response)
+        except httpx.InvalidURL as e:
+            breaker.release()
+            metrics.record_upstream('not_found', time.perf_counter() - start)
+            print(f"Error during request: {e}")
+            return None, 'not_found'
+        except (httpx.HTTPError, ValueError) as e:
+            breaker.record_failure()
+            metrics.record_upstream('error', time.perf_counter() - start)
+            print(f"Error during request: {e}")
+            return None, 'error'
+        except BaseException:
+            breaker.release()  # e.g. cancellation; a trial request must not stay in flight
+            raise
+        breaker.record_success()
+        metrics.record_upstream('ok', time.perf_counter() - start)
+        return payload, 'ok'
+
+
+client = AsyncCompendiumClient()
+quart_app = Quart(__name__)
+
+
+@quart_app.before_request
+async def start_request_metrics():
+    g.request_start = time.perf_counter()
+
+
+@quart_app.after_request
+async def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.REQUEST_DURATION.observe(time.perf_counter() - g.request_start, route=route, method=request.method,
+                                     status=response.status_code)
+    return response
+
+
+@quart_app.route('/search_item', methods=['GET', 'POST'])
+async def search_item():
+    if request.method == 'POST':
+        item_name = (await request.form)['item_name']
+        item_data = wsgi.indexes.refresh().index.lookup(item_name)
+        if item_data:
+            metrics.ITEM_LOOKUPS.inc(source='index')
+        else:
+            item_data = await client.fetch_item_details(item_name, wsgi.cache)
+
+        if item_data:
+            return await render_template('item_result.html', item=item_data)
+        else:
+            search_engine = wsgi.indexes.refresh().search_engine
+            suggestions = [result['name'] for result in search_engine.search(item_name, limit=5)]
+            return await render_template('search_item.html', error="Item not found.", suggestions=suggestions)
+    return await render_template('search_item.html')
+
+
+@quart_app.route('/autocomplete')
+async def autocomplete():
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', 10, type=int)
+    search_engine = wsgi.indexes.refresh().search_engine
+    return jsonify(query=query, results=search_engine.search(query, limit=max(1, min(limit, 50))))
+
+
+# Served by the Flask app; registered so templates rendered here can build its URL.
+quart_app.add_url_rule('/image/<key>', 'item_image')
+
+
+@quart_app.after_serving
+async def close_client():
+    await client.close()
+
+
+flask_app = WsgiToAsgi(wsgi.app)
+
+
+async def asgi_app(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] not in ASYNC_PATHS:
+        await flask_app(scope, receive, send)
+    else:
+        await quart_app(scope, receive, send)
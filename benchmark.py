@@ -0,0 +1,1170 @@
+"""Benchmarks for the Hyrule Compendium project.
+
+The benchmarks run against StubCompendium, a local stand-in for the compendium API that
+serves the entries in 'hyrule_retrieved.json', so no network access is required.
+
+Every benchmark returns a flat dict of measurements, so results can be tracked over time
+with the JSON report (results per benchmark plus the commit, Python version and machine).
+Benchmarks only measure: the behaviour they exercise is checked by the tests in 'tests/',
+which reuse StubCompendium and the reference implementations defined here. A benchmark
+needing an optional package that is not installed is reported as skipped.
+
+Usage:
+    python benchmark.py                         # run every benchmark
+    python benchmark.py crawler search          # run selected benchmarks by name
+    python benchmark.py --json results.json     # also write a JSON report
+    python benchmark.py heart_solver --json -   # print only the JSON report
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+import requests
+
+import zelda_functions as utl
+from hyrule_cache import LogCache
+from hyrule_index import SearchEngine
+
+DATASET_FILEPATH = 'hyrule_retrieved.json'
+API_PREFIX = '/api/v3/compendium'
+BENCHMARKS = {}
+
+
+def normalize_name(name):
+    return unquote(name).replace('_', ' ').strip().lower()
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Threading HTTP server that ignores clients closing their connection early, e.g. a
+    download abandoned after its status code or a request that timed out.
+    """
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubCompendium:
+    """Local HTTP server that mimics the compendium API endpoints used by the project:
+    /all, /category/<name>, /entry/<id or name> and /entry/<id or name>/image. Responses
+    carry an ETag and conditional requests for unchanged resources are answered with 304.
+
+    Parameters:
+        entries (list): entry dictionaries to serve
+        latency (float): seconds to sleep before answering each request
+        serve_all (bool): whether the /all endpoint is available
+        error_rate (float): fraction of requests answered with a 503 error
+        seed (int): seed of the random generator deciding which requests fail
+    """
+
+    def __init__(self, entries, latency=0.0, serve_all=True, error_rate=0.0, seed=0):
+        self.entries = entries
+        self.latency = latency
+        self.serve_all = serve_all
+        self.error_rate = error_rate
+        self.request_count = 0
+        self.error_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._by_key = {}
+        for entry in entries:
+            self._by_key[str(entry['id'])] = entry
+            self._by_key[normalize_name(entry['name'])] = entry
+        self._server = None
+        self._thread = None
+
+    @property
+    def endpoint(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.request_count += 1
+                    failed = stub.error_rate and stub._random.random() < stub.error_rate
+                    stub.error_count += bool(failed)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if failed:
+                    status, content_type, body = stub.json_response({'message': 'Service unavailable'}, status=503)
+                else:
+                    status, content_type, body = stub.route(urlparse(self.path).path)
+                etag = f'"{hashlib.sha1(body).hexdigest()}"'
+                if status == 200 and self.headers.get('If-None-Match') == etag:
+                    status, body = 304, b''
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                if status in (200, 304):
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = QuietHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def route(self, path):
+        """Returns the (status, content type, body) answered for the request < path >."""
+
+        parts = [part for part in path[len(API_PREFIX):].split('/') if part]
+        if parts == ['all'] and self.serve_all:
+            return self.json_response({'data': self.entries})
+        if len(parts) == 2 and parts[0] == 'category':
+            category = normalize_name(parts[1])
+            return self.json_response({'data': [e for e in self.entries if e['category'] == category]})
+        if len(parts) in (2, 3) and parts[0] == 'entry':
+            entry = self._by_key.get(normalize_name(parts[1]))
+            if entry and len(parts) == 2:
+                return self.json_response({'data': entry})
+            if entry and parts[2] == 'image':
+                return 200, 'image/png', f"image:{entry['id']}".encode()
+        return self.json_response({'data': {}, 'message': 'Not found'}, status=404)
+
+    @staticmethod
+    def json_response(payload, status=200):
+        return status, 'application/json', json.dumps(payload).encode()
+
+
+@contextmanager
+def use_endpoint(endpoint):
+    """Temporarily points the URL constants in < zelda_functions > at < endpoint >."""
+
+    names = ('HYRULE_ENDPOINT', 'HYRULE_CATEGORIES', 'HYRULE_ENTRY', 'HYRULE_ALL', 'HYRULE_IMAGE')
+    previous = {name: getattr(utl, name) for name in names}
+    utl.HYRULE_ENDPOINT = endpoint
+    utl.HYRULE_CATEGORIES = f"{endpoint}/category/"
+    utl.HYRULE_ENTRY = f"{endpoint}/entry/"
+    utl.HYRULE_ALL = f"{endpoint}/all/"
+    utl.HYRULE_IMAGE = f"{endpoint}/entry/{{}}/image"
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(utl, name, value)
+
+
+def load_entries(filepath=DATASET_FILEPATH, scale=1):
+    """Returns the entries of the dataset, or < scale > distinct copies of them (see
+    < scaled_entries >) to benchmark against a larger compendium.
+    """
+
+    entries = list(utl.read_json(filepath).values())
+    return scaled_entries(entries, scale) if scale > 1 else entries
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__.removeprefix('bench_')] = func
+    return func
+
+
+@benchmark
+def bench_crawler(latency=0.01, max_workers=16):
+    """Cold rebuild of the dataset: serial loop vs. concurrent crawler vs. /all endpoint."""
+
+    entries = load_entries()
+    results = {'entries': len(entries), 'latency_s': latency}
+    with StubCompendium(entries, latency=latency, serve_all=False) as stub, use_endpoint(stub.endpoint):
+        results['serial_s'], _ = timed(utl.fetch_data_until_invalid, 1)
+        results['concurrent_s'], _ = timed(
+            utl.fetch_data_concurrently, 1, max_workers=max_workers, use_all_endpoint=False)
+    with StubCompendium(entries, latency=latency) as stub, use_endpoint(stub.endpoint):
+        results['all_endpoint_s'], _ = timed(utl.fetch_data_concurrently, 1)
+    results['speedup'] = round(results['serial_s'] / results['concurrent_s'], 1)
+    return results
+
+
+@benchmark
+def bench_cache_writes(sizes=(100, 1000, 5000), samples=50):
+    """Per-miss persistence cost as the cache grows: whole-file rewrite vs. append-only log."""
+
+    entry = load_entries()[0]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in sizes:
+            rewrite_filepath = os.path.join(tmpdir, f"rewrite_{size}.json")
+            log_cache = LogCache(os.path.join(tmpdir, f"log_{size}.jsonl"), compact_threshold=10 * size)
+            cache = {}
+            for i in range(size):
+                cache[f"item {i}"] = entry
+                log_cache[f"item {i}"] = entry
+
+            start = time.perf_counter()
+            for i in range(samples):
+                cache[f"miss {i}"] = entry
+                utl.save_cache(rewrite_filepath, cache)
+            results[f"rewrite_{size}_ms"] = (time.perf_counter() - start) / samples * 1000
+
+            start = time.perf_counter()
+            for i in range(samples):
+                log_cache[f"miss {i}"] = entry
+            results[f"append_{size}_ms"] = (time.perf_counter() - start) / samples * 1000
+    return results
+
+
+@benchmark
+def bench_cache_stores(size=5000, ttl=60):
+    """Persistent item stores holding < size > entries: memory held by an opened store
+    compared with every entry decoded into a dict, lookup latency, and the time taken to
+    drop the half of the records older than < ttl > seconds (log compaction or SQLite purge).
+    """
+
+    import tracemalloc
+
+    entry = load_entries()[0]
+    now = time.time()
+    records = {f"item {i}": {'fetched_at': now - (i % 2) * 2 * ttl, 'data': entry} for i in range(size)}
+    keys = [f"item {i}" for i in range(0, size, 7)]
+    results = {'size': size}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for store, filename in (('log', 'cache.jsonl'), ('sqlite', 'cache.sqlite')):
+            filepath = os.path.join(tmpdir, filename)
+            utl.create_cache(filepath).update(records)
+
+            tracemalloc.start()
+            cache = utl.create_cache(filepath, ttl=ttl)
+            results[f"{store}_open_kb"] = tracemalloc.get_traced_memory()[0] / 1024
+            tracemalloc.stop()
+            tracemalloc.start()
+            decoded = dict(cache.items())
+            results[f"{store}_decoded_kb"] = tracemalloc.get_traced_memory()[0] / 1024
+            tracemalloc.stop()
+            del decoded
+
+            elapsed, _ = timed(lambda: [cache[key] for key in keys])
+            results[f"{store}_get_ms"] = elapsed / len(keys) * 1000
+
+            results[f"{store}_expire_ms"] = timed(cache.compact if store == 'log' else cache.purge)[0] * 1000
+    return results
+
+
+def shared_cache_worker(args):
+    filepath, worker, workers, writes = args
+    cache = utl.create_cache(filepath)
+    start = time.perf_counter()
+    for i in range(writes):
+        cache[f"{worker}-{i}"] = {'worker': worker, 'i': i}
+    write_s = time.perf_counter() - start
+    deadline = time.monotonic() + 30  # other workers' entries must show up without reopening the cache
+    while time.monotonic() < deadline and not all(f"{other}-{writes - 1}" in cache for other in range(workers)):
+        time.sleep(0.001)
+    start = time.perf_counter()
+    visible = sum(cache.get(f"{other}-{i}") is not None for other in range(workers) for i in range(writes))
+    read_s = time.perf_counter() - start
+    return write_s, read_s, visible
+
+
+@benchmark
+def bench_shared_cache(workers=4, writes=500):
+    """Several processes writing to and reading from one cache file: per-entry write and
+    read cost of each store, and the share of other workers' entries each one sees.
+    """
+
+    from multiprocessing import Pool
+
+    results = {'workers': workers, 'writes': writes}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for store, filename in (('log', 'cache.jsonl'), ('sqlite', 'cache.sqlite')):
+            filepath = os.path.join(tmpdir, filename)
+            utl.create_cache(filepath)
+            with Pool(workers) as pool:
+                outcomes = pool.map(shared_cache_worker, [(filepath, worker, workers, writes) for worker in range(workers)])
+            results[f"{store}_write_ms"] = statistics.mean(write_s for write_s, _, _ in outcomes) / writes * 1000
+            results[f"{store}_read_ms"] = statistics.mean(read_s for _, read_s, _ in outcomes) / (workers * writes) * 1000
+            results[f"{store}_visible"] = min(visible for _, _, visible in outcomes) / (workers * writes)
+    return results
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def misspell(name, rng):
+    i = rng.randrange(len(name))
+    return name[:i] + name[i + 1:] if rng.random() < 0.5 else name[:i] + rng.choice('aeiou') + name[i + 1:]
+
+
+@benchmark
+def bench_search(queries=3000, seed=0):
+    """Autocomplete latency over the full dataset for prefix, substring, misspelled and
+    misspelled partial queries, and the share of misspelled queries (full or partial) whose
+    name is among the results.
+    """
+
+    rng = random.Random(seed)
+    entries = load_entries()
+    engine = SearchEngine(entries)
+    names = [entry['name'] for entry in entries]
+    workload = []
+    for _ in range(queries):
+        name = rng.choice(names)
+        kind = rng.randrange(4)
+        if kind == 0:
+            workload.append((name[:rng.randint(1, len(name))], None))
+        elif kind == 1:
+            start = rng.randrange(len(name))
+            workload.append((name[start:start + rng.randint(3, 6)], None))
+        elif kind == 2:
+            workload.append((misspell(name, rng), name))
+        else:
+            workload.append((misspell(name[:rng.randint(min(5, len(name)), len(name))], rng), name))
+
+    samples = []
+    found = []
+    for query, name in workload:
+        start = time.perf_counter()
+        results = engine.search(query)
+        samples.append((time.perf_counter() - start) * 1000)
+        if name is not None:
+            found.append(any(result['name'] == name for result in results))
+    return {'queries': queries, 'mean_ms': statistics.fmean(samples), 'p50_ms': percentile(samples, 0.5),
+            'p99_ms': percentile(samples, 0.99), 'max_ms': max(samples), 'typo_recall': sum(found) / len(found)}
+
+
+def legacy_find_minimal_heart_combination(hearts_needed, items):
+    """The original list-per-cell DP, kept to compare against the back-pointer solver."""
+
+    items = sorted(items, key=lambda x: x['hearts_recovered'])
+    best_combinations = [None] * (int(hearts_needed * 10) + 1)
+    best_combinations[0] = []
+    for heart_value in range(len(best_combinations)):
+        for item in items:
+            if item['hearts_recovered'] * 10 <= heart_value:
+                prev_value = heart_value - int(item['hearts_recovered'] * 10)
+                if best_combinations[prev_value] is not None:
+                    if best_combinations[heart_value] is None or len(best_combinations[prev_value]) + 1 < len(best_combinations[heart_value]):
+                        best_combinations[heart_value] = best_combinations[prev_value] + [item]
+    for heart_value in range(int(hearts_needed * 10), -1, -1):
+        if best_combinations[heart_value] is not None:
+            return best_combinations[heart_value]
+    return None
+
+
+@benchmark
+def bench_heart_solver(legacy_targets=(10, 100, 300), targets=(10, 100, 1000, 5000, 20000)):
+    """Minimal heart combination: original list-per-cell DP vs. back-pointer NumPy solver."""
+
+    items = list(utl.read_json('hearts_recovered_entries.json').values())
+    results = {}
+    for target in legacy_targets:
+        results[f"legacy_{target}_s"], _ = timed(legacy_find_minimal_heart_combination, target, items)
+    for target in targets:
+        results[f"solver_{target}_s"], _ = timed(utl.find_minimal_heart_combination, target, items)
+    return results
+
+
+@benchmark
+def bench_heart_modes(targets=(20, 200, 1000), repeat=20):
+    """Extended heart solver: average latency of each query mode at several targets."""
+
+    items = list(utl.read_json('hearts_recovered_entries.json').values())
+    modes = {
+        'at_most': {},
+        'exact': {'exact': True},
+        'max_items': {'max_items': 10},
+        'inventory': {'inventory': {'fairy': 2, 'hearty salmon': 3, 'hearty durian': 1}},
+        'exclude': {'exclude': ['fairy', 'hearty salmon']},
+        'top_k': {'top_k': 5},
+        'exact_top_k': {'exact': True, 'top_k': 5},
+    }
+    results = {}
+    for target in targets:
+        for mode, options in modes.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                utl.find_heart_combinations(target + 0.5, items, **options)
+            results[f"{mode}_{target}_ms"] = (time.perf_counter() - start) / repeat * 1000
+    return results
+
+
+
+def brute_force_dish(cooking_index, hearts_needed, effect, exact):
+    # Best (rank, hearts) over every multiset of up to five ingredient groups.
+    from itertools import combinations_with_replacement
+
+    from hyrule_cooking import MAX_INGREDIENTS
+
+    groups = [key for key, _ in cooking_index.by_effect[effect]]
+    target = None if hearts_needed is None else utl.scale_target(hearts_needed, 1)
+    if exact and not utl.is_scaled_exactly(hearts_needed, target, 1):
+        return None
+    best = None
+    for size in range(1, MAX_INGREDIENTS + 1):
+        for combo in combinations_with_replacement(groups, size):
+            total = sum(hearts for hearts, _ in combo)
+            effects = {group_effect for _, group_effect in combo} - {None}
+            if effect and effects != {effect}:
+                continue
+            if target is not None and (total > target or exact and total != target):
+                continue
+            rank = (size,) if exact else (-total, size)
+            best = rank if best is None else min(best, rank)
+    return best
+
+
+@benchmark
+def bench_cooking(queries=200, top_k=5, checked=20, seed=0):
+    """Cooking optimizer latency over random hearts targets (half hearts, or just below
+    one, which no dish matches exactly) and required effects, and the latency of
+    exhaustive enumeration for the first < checked > queries.
+    """
+
+    from hyrule_cooking import CookingIndex
+
+    rng = random.Random(seed)
+    elapsed, cooking_index = timed(CookingIndex, load_entries())
+    effects = [None] + cooking_index.effects()
+    samples, brute_samples = [], []
+    for i in range(queries):
+        effect = rng.choice(effects)
+        hearts_needed = rng.choice([None, rng.randint(1, 50) / 2, rng.randint(2, 50) / 2 - 0.001])
+        exact = hearts_needed is not None and rng.random() < 0.5
+        seconds, _ = timed(cooking_index.cook, hearts_needed, effect, exact, top_k=top_k)
+        samples.append(seconds * 1000)
+        if i < checked:
+            seconds, _ = timed(brute_force_dish, cooking_index, hearts_needed, effect, exact)
+            brute_samples.append(seconds * 1000)
+    return {'groups': len(cooking_index.groups), 'index_build_ms': elapsed * 1000,
+            'p50_ms': percentile(samples, 0.5), 'p99_ms': percentile(samples, 0.99), 'max_ms': max(samples),
+            'brute_force_p50_ms': percentile(brute_samples, 0.5)}
+
+@benchmark
+def bench_charts(targets=(5, 20, 50, 200), repeat=20):
+    """/perform_analysis pie chart: cold import cost of Plotly, plotly.express per request
+    vs. the prebuilt figure, and memoized responses through the Flask test client.
+    """
+
+    import subprocess
+
+    import plotly
+    import plotly.express as px
+
+    import app as web
+
+    def import_seconds(module):
+        code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+        return float(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout)
+
+    results = {'import_plotly_express_s': import_seconds('plotly.express'), 'import_app_s': import_seconds('app')}
+    charts = []
+    for target in targets:
+        combo = utl.perform_local_analysis(target)[1]
+        charts.append((target, tuple((item['name'], item['hearts_recovered']) for item in combo)))
+
+    def plotly_express():
+        for target, slices in charts:
+            fig = px.pie(names=[name for name, _ in slices], values=[hearts for _, hearts in slices],
+                         title=f"Heart Recovery Items Distribution for {target} Hearts")
+            json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+
+    def prebuilt():
+        web.heart_chart_json.cache_clear()
+        for target, slices in charts:
+            web.heart_chart_json(target, slices)
+
+    def memoized():
+        for target, slices in charts:
+            web.heart_chart_json(target, slices)
+
+    for name, func in (('plotly_express', plotly_express), ('prebuilt', prebuilt), ('memoized', memoized)):
+        results[f"{name}_ms"] = min(timed(func)[0] for _ in range(repeat)) / len(charts) * 1000
+
+    client = web.app.test_client()
+    web.heart_chart_json.cache_clear()
+    results['cold_request_ms'] = timed(client.post, '/perform_analysis', data={'hearts_needed': '20'})[0] * 1000
+    results['warm_request_ms'] = min(timed(client.post, '/perform_analysis', data={'hearts_needed': '20'})[0]
+                                     for _ in range(repeat)) * 1000
+    return results
+
+
+@benchmark
+def bench_tree_build(latency=0.2):
+    """Cold tree build from the API (no local dataset): one category at a time vs. all
+    categories concurrently over the shared session.
+    """
+
+    import final_project
+
+    entries = load_entries()
+    results = {'latency_s': latency}
+    with StubCompendium(entries, latency=latency) as stub, use_endpoint(stub.endpoint):
+        missing_dataset = os.path.join(tempfile.gettempdir(), 'missing_hyrule_dataset.json')
+        results['sequential_s'], _ = timed(final_project.build_tree, missing_dataset, max_workers=1)
+        requests_before = stub.request_count
+        results['concurrent_s'], _ = timed(final_project.build_tree, missing_dataset)
+        results['requests'] = stub.request_count - requests_before
+    return results
+
+
+@benchmark
+def bench_index_load(repeat=50):
+    """Startup cost of the web app: json.load of 'hyrule_retrieved.json' vs. building every
+    index over it (< app.load_indexes >).
+    """
+
+    import app as web
+
+    def best(func):
+        return min(timed(func)[0] for _ in range(repeat)) * 1000
+
+    return {
+        'json_bytes': os.path.getsize(DATASET_FILEPATH),
+        'json_load_ms': best(lambda: utl.read_json(DATASET_FILEPATH)),
+        'app_indexes_ms': best(lambda: web.load_indexes(DATASET_FILEPATH)),
+    }
+
+
+def legacy_process_entries(input_filepath, output_filepath):
+    """The original hearts index builder, kept to compare against the streaming pipeline."""
+
+    with open(input_filepath, 'r') as file:
+        data = json.load(file)
+    hearts_recovered_entries = {}
+    for key, entry in data.items():
+        if 'hearts_recovered' in entry:
+            hearts_recovered_entries[key] = {
+                'name': entry['name'],
+                'common_locations': entry.get('common_locations', []),
+                'hearts_recovered': entry['hearts_recovered'],
+                'image': entry['image']
+            }
+    with open(output_filepath, 'w') as file:
+        json.dump(hearts_recovered_entries, file, indent=4)
+
+
+@benchmark
+def bench_derived_files(repeat=5):
+    """Building the derived files: legacy process_entries plus a separate tree build and
+    serialization vs. one streaming pass feeding every output, and the current
+    process_entries (hearts index only). Reports time and peak Python memory of each.
+    """
+
+    import tracemalloc
+
+    import final_project
+    import hyrule_pipeline
+
+    def legacy(directory):
+        legacy_process_entries(DATASET_FILEPATH, os.path.join(directory, 'hearts.json'))
+        tree = final_project.build_tree(DATASET_FILEPATH)
+        utl.save_data_to_json({name: final_project.serialize_tree(node) for name, node in tree.items()},
+                              os.path.join(directory, 'tree.json'))
+
+    def streaming(directory):
+        hyrule_pipeline.build_derived_files(DATASET_FILEPATH, [
+            hyrule_pipeline.HeartsIndex(os.path.join(directory, 'hearts.json')),
+            hyrule_pipeline.CategoryTree(os.path.join(directory, 'tree.json')),
+            hyrule_pipeline.NameIndex(os.path.join(directory, 'names.json')),
+            hyrule_pipeline.CategoryStats(os.path.join(directory, 'stats.json')),
+        ])
+
+    def process_entries(directory):
+        final_project.process_entries(DATASET_FILEPATH, os.path.join(directory, 'hearts.json'))
+
+    results = {}
+    for name, build in (('legacy', legacy), ('streaming', streaming), ('process_entries', process_entries)):
+        with tempfile.TemporaryDirectory() as directory:
+            results[f"{name}_ms"] = min(timed(build, directory)[0] for _ in range(repeat)) * 1000
+            tracemalloc.start()
+            build(directory)
+            results[f"{name}_peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+            results[f"{name}_outputs"] = len(os.listdir(directory))
+    return results
+
+
+@benchmark
+def bench_sync(latency=0.005, changed=3):
+    """Refreshing the local dataset: full per-entry re-crawl vs. incremental sync when
+    nothing changed and when < changed > entries changed upstream, plus the conditional
+    /all request.
+    """
+
+    import final_project
+    import hyrule_pipeline
+
+    entries = load_entries()
+    results = {'entries': len(entries), 'latency_s': latency}
+    with tempfile.TemporaryDirectory() as directory:
+        paths = {name: os.path.join(directory, filename) for name, filename in (
+            ('dataset_filepath', 'hyrule_retrieved.json'), ('metadata_filepath', 'hyrule_sync.json'),
+            ('tree_filepath', 'hyrule_tree.json'), ('hearts_filepath', 'hearts.json'))}
+
+        def make_outputs():
+            return [hyrule_pipeline.NameIndex(os.path.join(directory, 'names.json')),
+                    hyrule_pipeline.CategoryStats(os.path.join(directory, 'stats.json'))]
+
+        def sync(stub, **options):
+            requests_before = stub.request_count
+            elapsed, changes = timed(final_project.sync_local_data, **paths, make_outputs=make_outputs, **options)
+            return elapsed, stub.request_count - requests_before, changes
+
+        with StubCompendium(entries, latency=latency, serve_all=False) as stub, use_endpoint(stub.endpoint):
+            results['full_crawl_s'], _ = timed(utl.fetch_data_concurrently, 1, use_all_endpoint=False)
+            results['cold_sync_s'], _, _ = sync(stub)
+            tree = final_project.build_tree(paths['dataset_filepath'])
+            utl.save_data_to_json({name: final_project.serialize_tree(node) for name, node in tree.items()},
+                                  paths['tree_filepath'])
+            results['unchanged_sync_s'], results['unchanged_requests'], _ = sync(stub, max_age=0)
+            results['fresh_sync_s'], results['fresh_requests'], _ = sync(stub)
+
+        modified = [dict(entry) for entry in entries]
+        for entry in modified[:changed]:
+            entry['name'] = f"{entry['name']} (renamed)"
+            entry['hearts_recovered'] = 7.0
+        with StubCompendium(modified, latency=latency, serve_all=False) as stub, use_endpoint(stub.endpoint):
+            results['changed_sync_s'], _, _ = sync(stub, max_age=0)
+
+        with StubCompendium(modified, latency=latency) as stub, use_endpoint(stub.endpoint):
+            sync(stub)
+            results['all_not_modified_s'], results['all_not_modified_requests'], _ = sync(stub)
+    return results
+
+
+def synthetic_entries(count, start_id=10000):
+    """Entries that exist only on the stub, so looking them up always goes upstream."""
+
+    return [{'category': 'materials', 'common_locations': None, 'cooking_effect': '', 'description': '',
+             'dlc': False, 'hearts_recovered': 1.0, 'id': start_id + i, 'image': '',
+             'name': f"synthetic item {i}"} for i in range(count)]
+
+
+def scaled_entries(entries, scale, seed=0):
+    """Returns < scale > copies of < entries > with distinct IDs and names. Copies keep
+    the value distribution of the original fields, but numeric fields are jittered and
+    locations shuffled so that copies are not identical.
+    """
+
+    rng = random.Random(seed)
+    locations = sorted({location for entry in entries for location in entry.get('common_locations') or ()})
+    id_span = max(entry['id'] for entry in entries)  # keeps IDs contiguous for the crawlers
+    scaled = []
+    for copy in range(scale):
+        for entry in entries:
+            entry = json.loads(json.dumps(entry))
+            entry['id'] += copy * id_span
+            entry['name'] = f"{entry['name']} {copy}" if copy else entry['name']
+            if entry.get('common_locations') and copy:
+                entry['common_locations'] = rng.sample(locations, len(entry['common_locations']))
+            if isinstance(entry.get('hearts_recovered'), float) and copy:
+                entry['hearts_recovered'] = round(entry['hearts_recovered'] * rng.uniform(0.5, 1.5), 2)
+            for key, value in (entry.get('properties') or {}).items():
+                if isinstance(value, int) and copy:
+                    entry['properties'][key] = max(0, value + rng.randint(-5, 5))
+            scaled.append(entry)
+    return scaled
+
+
+def linear_query(entries, filters, ranges):
+    """Filters < entries > by scanning every entry, with the semantics of QueryIndex.query."""
+
+    from hyrule_index import BOOLEAN_FIELDS, FILTER_FIELDS, RANGE_FIELDS, normalize_value
+
+    matched = []
+    for entry in entries:
+        for name, accepted in filters.items():
+            value = entry.get(FILTER_FIELDS[name])
+            if name in BOOLEAN_FIELDS:
+                value = bool(value)
+            values = {normalize_value(item) for item in (value if isinstance(value, list) else [value])
+                      if item is not None and item != ''}
+            if not values & {normalize_value(item) for item in accepted}:
+                break
+        else:
+            for name, (low, high) in ranges.items():
+                value = entry
+                for key in RANGE_FIELDS[name]:
+                    value = value.get(key) if isinstance(value, dict) else None
+                if not isinstance(value, (int, float)) or isinstance(value, bool) or \
+                        (low is not None and value < low) or (high is not None and value > high):
+                    break
+            else:
+                matched.append(entry)
+    return sorted(matched, key=lambda entry: entry['id'])
+
+
+@benchmark
+def bench_query(scale=100, queries=100, limit=20, seed=0):
+    """Structured /query filters over a dataset < scale > times the real one: linear scan
+    vs. QueryIndex set intersections.
+    """
+
+    from hyrule_index import QueryIndex
+
+    rng = random.Random(seed)
+    entries = scaled_entries(load_entries(), scale, seed)
+    build_s, index = timed(QueryIndex, entries)
+
+    categories = index.values('category')
+    locations = index.values('location')
+    effects = index.values('cooking_effect')
+    workload = []
+    for _ in range(queries):
+        filters, ranges = {}, {}
+        for _ in range(rng.randint(1, 3)):
+            kind = rng.randrange(6)
+            if kind == 0:
+                filters['category'] = [rng.choice(categories)]
+            elif kind == 1:
+                filters['location'] = rng.sample(locations, rng.randint(1, 2))
+            elif kind == 2:
+                filters['cooking_effect'] = [rng.choice(effects)]
+            elif kind == 3:
+                filters['edible'] = [rng.choice(('true', 'false'))]
+            elif kind == 4:
+                low = rng.uniform(0, 3)
+                ranges['hearts'] = (low, low + rng.uniform(0.5, 5))
+            else:
+                low = rng.randint(0, 40)
+                ranges['attack'] = (low, low + rng.randint(5, 30))
+        workload.append((filters, ranges))
+
+    linear_samples, index_samples = [], []
+    for filters, ranges in workload:
+        start = time.perf_counter()
+        linear_query(entries, filters, ranges)
+        linear_samples.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        index.query(filters, ranges, 0, limit)
+        index_samples.append((time.perf_counter() - start) * 1000)
+    return {'entries': len(entries), 'index_build_s': build_s,
+            'linear_p50_ms': percentile(linear_samples, 0.5), 'linear_p99_ms': percentile(linear_samples, 0.99),
+            'index_p50_ms': percentile(index_samples, 0.5), 'index_p99_ms': percentile(index_samples, 0.99)}
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI server handling requests on a fixed pool of threads, like a gunicorn worker
+    with a bounded number of threads.
+    """
+
+    request_queue_size = 128
+
+    def __init__(self, address, app, workers):
+        super().__init__(address, QuietWSGIRequestHandler)
+        self.set_app(app)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+class QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_wsgi(app, workers=8):
+    server = PooledWSGIServer(('127.0.0.1', 0), app, workers)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.pool.shutdown()
+        server.server_close()
+
+
+@contextmanager
+def serve_asgi(app):
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.accesslog = config.errorlog = None
+    state = {}
+
+    async def run():
+        state['loop'], state['stop'] = asyncio.get_running_loop(), asyncio.Event()
+        await serve(app, config, shutdown_trigger=state['stop'].wait)
+
+    thread = threading.Thread(target=asyncio.run, args=(run(),), daemon=True)
+    thread.start()
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        state['loop'].call_soon_threadsafe(state['stop'].set)
+        thread.join()
+
+
+def load_test(url, form_values, clients):
+    """POSTs every value in < form_values > to < url > from < clients > threads.
+
+    Returns:
+        tuple: (elapsed seconds, number of non-200 responses)
+    """
+
+    def post(value):
+        return requests.post(url, data={'item_name': value}, timeout=60).status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        statuses = list(executor.map(post, form_values))
+    return time.perf_counter() - start, sum(status != 200 for status in statuses)
+
+
+@benchmark
+def bench_async_serving(latency=0.2, distinct=100, repeats=3, clients=50, sync_workers=8):
+    """Throughput of /search_item for items missing from the local dataset against a
+    delayed upstream: the sync Flask app on a fixed thread pool vs. the ASGI mode.
+    """
+
+    import hypercorn  # noqa: F401 - needed by serve_asgi, imported first to skip before the sync run
+
+    import app
+    import asgi_app
+    from hyrule_cache import TieredCache
+
+    workload = [f"synthetic item {i % distinct}" for i in range(distinct * repeats)]
+    random.Random(0).shuffle(workload)
+    results = {'requests': len(workload), 'latency_s': latency, 'clients': clients}
+    entries = load_entries() + synthetic_entries(distinct)
+    original_cache = app.cache
+    try:
+        with StubCompendium(entries, latency=latency) as stub, use_endpoint(stub.endpoint):
+            app.cache = TieredCache()
+            with serve_wsgi(app.app, workers=sync_workers) as base_url:
+                elapsed, errors = load_test(f"{base_url}/search_item", workload, clients)
+            results.update(sync_rps=len(workload) / elapsed, sync_upstream=stub.request_count, sync_errors=errors)
+
+            app.cache = TieredCache()
+            requests_before = stub.request_count
+            with serve_asgi(asgi_app.asgi_app) as base_url:
+                elapsed, errors = load_test(f"{base_url}/search_item", workload, clients)
+            results.update(async_rps=len(workload) / elapsed, async_upstream=stub.request_count - requests_before,
+                           async_errors=errors, coalesced=asgi_app.client.coalesced)
+    finally:
+        app.cache = original_cache
+    return results
+
+
+
+@benchmark
+def bench_item_lookup(latency=0.005, lookups=200):
+    """fetch_item_details per lookup: a miss answered upstream, an in-memory hit, a hit on
+    the persisted log through a fresh TieredCache, and unknown names before and after they
+    are negatively cached.
+    """
+
+    from hyrule_cache import TieredCache
+
+    entries = load_entries()
+    names = [entry['name'] for entry in entries[:lookups]]
+    unknown = [f"unknown item {i}" for i in range(len(names))]
+    results = {'lookups': len(names), 'latency_s': latency}
+    with tempfile.TemporaryDirectory() as directory, \
+            StubCompendium(entries, latency=latency) as stub, use_endpoint(stub.endpoint):
+        store_filepath = os.path.join(directory, 'cache.jsonl')
+
+        def per_lookup_ms(cache, keys):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):  # fetch_item_details prints every 404
+                for key in keys:
+                    utl.fetch_item_details(key, cache, store_filepath)
+            return (time.perf_counter() - start) / len(keys) * 1000
+
+        cache = TieredCache(LogCache(store_filepath), negative_ttl=60)
+        results['miss_ms'] = per_lookup_ms(cache, names)
+        results['memory_hit_ms'] = per_lookup_ms(cache, names)
+        results['disk_hit_ms'] = per_lookup_ms(TieredCache(LogCache(store_filepath)), names)
+        results['not_found_ms'] = per_lookup_ms(cache, unknown)
+        results['negative_hit_ms'] = per_lookup_ms(cache, unknown)
+        results['upstream_requests'] = stub.request_count
+    return results
+
+
+
+@benchmark
+def bench_batch_lookup(latency=0.005, batch_size=50):
+    """fetch_item_details called once per name versus one fetch_items_details call for the
+    same names (with duplicates), both starting from an empty cache.
+    """
+
+    from hyrule_cache import TieredCache
+
+    entries = load_entries()
+    names = [entry['name'] for entry in entries[:batch_size]]
+    batch = names + names[:batch_size // 2]
+    results = {'batch_size': len(batch), 'distinct': len(names), 'latency_s': latency}
+    with tempfile.TemporaryDirectory() as directory, \
+            StubCompendium(entries, latency=latency) as stub, use_endpoint(stub.endpoint):
+        serial_filepath = os.path.join(directory, 'serial.jsonl')
+        serial_cache = TieredCache(LogCache(serial_filepath))
+        start = time.perf_counter()
+        for name in batch:
+            utl.fetch_item_details(name, serial_cache, serial_filepath)
+        results['serial_ms'] = (time.perf_counter() - start) * 1000
+        results['serial_requests'] = stub.request_count
+
+        batch_filepath = os.path.join(directory, 'batch.jsonl')
+        elapsed, _ = timed(utl.fetch_items_details, batch, TieredCache(LogCache(batch_filepath)), batch_filepath)
+        results['batch_ms'] = elapsed * 1000
+        results['batch_requests'] = stub.request_count - results['serial_requests']
+    return results
+
+@benchmark
+def bench_flaky_upstream(latency=0.002, error_rate=0.1, max_workers=16, hung_latency=1.0, timeout=0.3):
+    """Concurrent crawl against a stub failing < error_rate > of requests with 503s, which
+    the session retries. Also times an interactive lookup against a stub answering after
+    < hung_latency > seconds, which gives up after a single < timeout >.
+    """
+
+    entries = load_entries()
+    with StubCompendium(entries, latency=latency, serve_all=False, error_rate=error_rate) as stub, \
+            use_endpoint(stub.endpoint):
+        elapsed, data = timed(utl.fetch_data_concurrently, 1, max_workers=max_workers, backoff=0.01,
+                              use_all_endpoint=False)
+    results = {'entries': len(entries), 'error_rate': error_rate, 'crawl_s': elapsed, 'fetched': len(data),
+               'requests': stub.request_count, 'injected_errors': stub.error_count}
+
+    with StubCompendium(entries[:1], latency=hung_latency) as stub, use_endpoint(stub.endpoint), \
+            contextlib.redirect_stdout(io.StringIO()):
+        results['hung_lookup_s'], _ = timed(utl.request_json, f"{utl.HYRULE_ENTRY}1", timeout=timeout)
+        results['hung_requests'] = stub.request_count
+    return results
+
+
+@benchmark
+def bench_image_cache(latency=0.005, images=50):
+    """ImageCache against the stub: cold downloads, cached lookups, and a prefetch of
+    every image given a generator.
+    """
+
+    from image_cache import ImageCache
+
+    entries = load_entries()[:images]
+    with tempfile.TemporaryDirectory() as directory, \
+            StubCompendium(entries, latency=latency) as stub, use_endpoint(stub.endpoint):
+        urls = [utl.HYRULE_IMAGE.format(entry['id']) for entry in entries]
+        image_cache = ImageCache(os.path.join(directory, 'images'))
+        half = len(urls) // 2
+        cold_s, _ = timed(lambda: [image_cache.get(url) for url in urls[:half]])
+        warm_s, _ = timed(lambda: [image_cache.get(url) for url in urls[:half]])
+        prefetch_s, _ = timed(image_cache.prefetch, (url for url in urls + urls))
+    return {'images': len(urls), 'latency_s': latency, 'cold_ms': cold_s / half * 1000,
+            'cached_ms': warm_s / half * 1000, 'prefetch_ms': prefetch_s * 1000, 'requests': stub.request_count}
+
+
+@contextmanager
+def use_breaker(breaker):
+    """Temporarily replaces < zelda_functions.upstream_breaker > with < breaker >."""
+
+    previous, utl.upstream_breaker = utl.upstream_breaker, breaker
+    try:
+        yield breaker
+    finally:
+        utl.upstream_breaker = previous
+
+
+def wait_until(condition, timeout=5.0, interval=0.005):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+
+@benchmark
+def bench_stale_revalidate(latency=0.05, lookups=50):
+    """Stale-while-revalidate in TieredCache: lookups of stale entries answered from the
+    cache while the stub answers after < latency > seconds, and the time until the
+    background refreshes have replaced every entry.
+    """
+
+    from hyrule_cache import TieredCache
+
+    entries = load_entries()[:lookups]
+    with tempfile.TemporaryDirectory() as directory, \
+            StubCompendium(entries, latency=latency) as stub, use_endpoint(stub.endpoint):
+        store = LogCache(os.path.join(directory, 'cache.jsonl'))
+        store.update({entry['name']: {'fetched_at': time.time() - 120, 'data': {'name': entry['name'], 'stale': True}}
+                      for entry in entries})
+        cache = TieredCache(store, stale_after=60, refresh=lambda key: utl.fetch_item_from_api(key)[0])
+        elapsed, _ = timed(lambda: [cache.get(entry['name']) for entry in entries])
+        results = {'lookups': len(entries), 'latency_s': latency, 'stale_lookup_ms': elapsed / len(entries) * 1000}
+
+        start = time.perf_counter()
+        wait_until(lambda: cache.stats()['refreshes'] == len(entries))
+        results['refresh_s'] = time.perf_counter() - start
+        results['refreshes'] = cache.stats()['refreshes']
+        results['upstream_requests'] = stub.request_count
+    return results
+
+
+@benchmark
+def bench_circuit_breaker(failure_threshold=3, reset_timeout=0.2, open_lookups=100):
+    """Upstream circuit breaker against a stub answering every request with a 503: cost of
+    the < failure_threshold > failing requests that open the circuit, and of the lookups
+    failing fast while it is open.
+    """
+
+    entries = load_entries()[:1]
+    results = {'failure_threshold': failure_threshold, 'reset_timeout_s': reset_timeout}
+    utl.configure_session(retries=0)
+    try:
+        with StubCompendium(entries, error_rate=1.0) as stub, use_endpoint(stub.endpoint), \
+                use_breaker(utl.CircuitBreaker(failure_threshold, reset_timeout)), \
+                contextlib.redirect_stdout(io.StringIO()):
+            url = f"{utl.HYRULE_ENTRY}{entries[0]['name']}"
+            elapsed, _ = timed(lambda: [utl.request_json(url) for _ in range(failure_threshold)])
+            results['failing_lookup_us'] = elapsed / failure_threshold * 1e6
+            elapsed, _ = timed(lambda: [utl.request_json(url) for _ in range(open_lookups)])
+            results['open_lookup_us'] = elapsed / open_lookups * 1e6
+            results['upstream_requests'] = stub.request_count
+    finally:
+        utl.configure_session()
+    return results
+
+
+@benchmark
+def bench_routes(requests_per_route=300, clients=16, workers=8, seed=0):
+    """Flask routes under concurrent load on a fixed thread pool: throughput and latency
+    percentiles per route, for requests answered from local data.
+    """
+
+    import app as web
+
+    rng = random.Random(seed)
+    names = [entry['name'] for entry in load_entries()]
+    categories = ['materials', 'equipment', 'monsters', 'creatures', 'treasure']
+    workloads = {
+        'autocomplete': [('GET', '/autocomplete', {'q': rng.choice(names)[:rng.randint(2, 6)]}, None)
+                         for _ in range(requests_per_route)],
+        'query': [('GET', '/query', {'category': rng.choice(categories), 'min_hearts': rng.randint(0, 3)}, None)
+                  for _ in range(requests_per_route)],
+        'search_item': [('POST', '/search_item', None, {'item_name': rng.choice(names)})
+                        for _ in range(requests_per_route)],
+        'perform_analysis': [('POST', '/perform_analysis', None, {'hearts_needed': rng.randint(1, 60)})
+                             for _ in range(requests_per_route)],
+        'metrics': [('GET', '/metrics', None, None) for _ in range(requests_per_route)],
+    }
+
+    results = {'clients': clients, 'workers': workers}
+    with serve_wsgi(web.app, workers=workers) as base_url:
+        def send(call):
+            method, path, params, data = call
+            start = time.perf_counter()
+            status = requests.request(method, f"{base_url}{path}", params=params, data=data, timeout=60).status_code
+            return time.perf_counter() - start, status
+
+        for route, calls in workloads.items():
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as executor:
+                outcomes = list(executor.map(send, calls))
+            elapsed = time.perf_counter() - start
+            samples = [seconds * 1000 for seconds, _ in outcomes]
+            results[f"{route}_rps"] = len(calls) / elapsed
+            results[f"{route}_p50_ms"] = percentile(samples, 0.5)
+            results[f"{route}_p99_ms"] = percentile(samples, 0.99)
+            results[f"{route}_errors"] = sum(status != 200 for _, status in outcomes)
+    return results
+
+def main(argv=None):
+    import argparse
+    import platform
+    import subprocess
+
+    parser = argparse.ArgumentParser(description='Run the Hyrule Compendium benchmarks.')
+    parser.add_argument('names', nargs='*', metavar='name', help=f"benchmarks to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON to PATH ('-' for stdout only)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    report = {'results': {}, 'skipped': {}}
+    for name in args.names or BENCHMARKS:
+        start = time.perf_counter()
+        try:
+            results = BENCHMARKS[name]()
+        except ModuleNotFoundError as e:  # an optional package such as plotly or httpx
+            report['skipped'][name] = f"{e.name} is not installed"
+            if args.json != '-':
+                print(f"{name}: skipped, {e.name} is not installed")
+            continue
+        report['results'][name] = dict(results, wall_s=time.perf_counter() - start)
+        if args.json != '-':
+            print(f"{name}: " + ', '.join(f"{key}={value:.4g}" if isinstance(value, float) else f"{key}={value}"
+                                          for key, value in results.items()))
+
+    if args.json:
+        try:
+            commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+        except OSError:
+            commit = ''
+        report['meta'] = {'timestamp': time.time(), 'commit': commit or None, 'python': platform.python_version(),
+                          'platform': platform.platform(), 'cpus': os.cpu_count()}
+        output = json.dumps(report, indent=4, sort_keys=True)
+        if args.json == '-':
+            print(output)
+        else:
+            with open(args.json, 'w') as file:
+                file.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
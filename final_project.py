@@ -1,74 +1,154 @@
 import zelda_functions as utl
 from app import app
+from hyrule_index import CompendiumIndex, normalize_key
+from hyrule_pipeline import CATEGORY_TYPES, CategoryTree, HeartsIndex, build_derived_files, default_outputs, hearts_record
 import os
 import json
+import requests
+import sys
+from concurrent.futures import ThreadPoolExecutor
 
-CACHE_FILEPATH = './CACHE.json'
 NONE_VALUES = ('', 'n/a', 'none', 'unknown')
 HYRULE_ENDPOINT = 'https://botw-compendium.herokuapp.com/api/v3/compendium'
 HYRULE_CATEGORIES = f"{HYRULE_ENDPOINT}/category/"
 HYRULE_ENTRY = f"{HYRULE_ENDPOINT}/entry/"
 HYRULE_ALL = f"{HYRULE_ENDPOINT}/all/"
 HYRULE_IMAGE = f"{HYRULE_ENDPOINT}/entry/{{}}/image"
+DATASET_FILEPATH = 'hyrule_retrieved.json'
+TREE_FILEPATH = 'hyrule_tree.json'
+SYNC_METADATA_FILEPATH = 'hyrule_sync.json'
 
-# Initialize or retrieve cache
-cache = utl.create_cache(CACHE_FILEPATH)
 
 class TreeNode:
-    def __init__(self, name, type, data=None, children=None):
+    """Compact tree node. Uses __slots__ instead of a per-instance __dict__, and both
+    < children > and < data > can be loaded lazily: the loader callables are invoked with
+    the node the first time the attribute is read, and their result is kept.
+    """
+
+    __slots__ = ('name', 'type', '_data', '_children', '_load_data', '_load_children')
+
+    def __init__(self, name, type, data=None, children=None, load_data=None, load_children=None):
         self.name = name
         self.type = type
-        self.data = data
-        self.children = children or []
+        self._data = data
+        self._children = children
+        self._load_data = load_data
+        self._load_children = load_children
+
+    @property
+    def data(self):
+        if self._data is None and self._load_data:
+            self._data = self._load_data(self)
+            self._load_data = None
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._load_data = None
+
+    @property
+    def children(self):
+        if self._children is None:
+            self._children = self._load_children(self) if self._load_children else []
+            self._load_children = None
+        return self._children
+
+    @property
+    def children_loaded(self):
+        return self._children is not None
 
     def add_child(self, child_node):
         self.children.append(child_node)
 
-def build_tree():
-    root_nodes = {
-        'Monsters': TreeNode('Monsters', 'Category'),
-        'Equipment': TreeNode('Equipment', 'Category'),
-        'Materials': TreeNode('Materials', 'Category'),
-        'Creatures': TreeNode('Creatures', 'Category'),
-        'Treasure': TreeNode('Treasure', 'Category')
-    }
-
-    # Add child nodes for Monsters
-    monsters_data = utl.request_data(f"{HYRULE_CATEGORIES}monsters")
-    if monsters_data and 'data' in monsters_data:
-        for monster in monsters_data['data']:
-            monster_node = TreeNode(monster['name'], 'Monster')
-            root_nodes['Monsters'].add_child(monster_node)
-
-    # Add child nodes for Equipment
-    equipment_data = utl.request_data(f"{HYRULE_CATEGORIES}equipment")
-    if equipment_data and 'data' in equipment_data:
-        for equipment in equipment_data['data']:
-            equipment_node = TreeNode(equipment['name'], 'Equipment')
-            root_nodes['Equipment'].add_child(equipment_node)
-
-    # Add child nodes for Materials
-    materials_data = utl.request_data(f"{HYRULE_CATEGORIES}materials")
-    if materials_data and 'data' in materials_data:
-        for material in materials_data['data']:
-            material_node = TreeNode(material['name'], 'Material')
-            root_nodes['Materials'].add_child(material_node)
-
-    # Add child nodes for Creatures
-    creatures_data = utl.request_data(f"{HYRULE_CATEGORIES}creatures")
-    if creatures_data and 'data' in creatures_data:
-        for creature in creatures_data['data']:
-            creature_node = TreeNode(creature['name'], 'Creature')
-            root_nodes['Creatures'].add_child(creature_node)
 
-    # Add child nodes for Treasure
-    treasure_data = utl.request_data(f"{HYRULE_CATEGORIES}treasure")
-    if treasure_data and 'data' in treasure_data:
-        for treasure in treasure_data['data']:
-            treasure_node = TreeNode(treasure['name'], 'Treasure')
-            root_nodes['Treasure'].add_child(treasure_node)
+class HyruleTree:
+    """Category tree over the compendium whose category nodes are expanded on first
+    access, from the local dataset when it holds entries for the category and from the
+    API otherwise. Creating the tree does no I/O at all. Keeps category→node and
+    name→node indexes for O(1) navigation.
 
-    return root_nodes
+    Parameters:
+        dataset_filepath (str): path to the local dataset keyed by entry ID
+    """
+
+    def __init__(self, dataset_filepath=DATASET_FILEPATH):
+        self.dataset_filepath = dataset_filepath
+        self._index = None
+        self.by_name = {}
+        self.by_category = {}
+        self.root_nodes = {}
+        for name in CATEGORY_TYPES:
+            node = TreeNode(name, 'Category', load_children=self._load_category)
+            self.root_nodes[name] = node
+            self.by_category[name.lower()] = node
+
+    @property
+    def index(self):
+        if self._index is None:
+            try:
+                self._index = CompendiumIndex.from_json(self.dataset_filepath)
+            except FileNotFoundError:
+                self._index = CompendiumIndex([])
+        return self._index
+
+    def category(self, name):
+        """Returns the category node for < name > (e.g. 'Monsters' or 'monsters'), or None."""
+
+        return self.by_category.get(name.lower())
+
+    def find(self, name):
+        """Returns the node of the entry called < name >, expanding only the category the
+        local dataset places it in (or every category if the dataset does not know it).
+        """
+
+        key = normalize_key(name)
+        if key not in self.by_name:
+            entry = self.index.lookup(key)
+            categories = [self.category(entry['category'])] if entry else self.root_nodes.values()
+            for node in categories:
+                node.children  # expands the category and registers its entries
+                if key in self.by_name:
+                    break
+        return self.by_name.get(key)
+
+    def expand_all(self, max_workers=len(CATEGORY_TYPES)):
+        """Expands every category node, loading the categories concurrently so that a
+        cold build against the API costs about one round trip instead of one per category.
+
+        Parameters:
+            max_workers (int): maximum number of categories loaded at the same time
+        """
+
+        self.index  # load the local dataset once, before the worker threads need it
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lambda node: node.children, self.root_nodes.values()))
+
+    def _load_category(self, node):
+        category = node.name.lower()
+        entries = [entry for entry in self.index.by_id.values() if entry['category'] == category]
+        if not entries:
+            response = utl.request_data(f"{utl.HYRULE_CATEGORIES}{category}")
+            entries = response['data'] if response and 'data' in response else []
+        return [self._add_entry_node(entry['name'], CATEGORY_TYPES[node.name], entry) for entry in entries]
+
+    def _add_entry_node(self, name, type, data=None):
+        child = TreeNode(name, type, data=data, load_data=self._load_entry)
+        self.by_name[normalize_key(name)] = child
+        return child
+
+    def _load_entry(self, node):
+        entry = self.index.lookup(node.name)
+        if entry is None:
+            response = utl.request_data(f"{utl.HYRULE_ENTRY}{node.name}")
+            entry = response['data'] if response and 'data' in response else None
+        return entry
+
+
+def build_tree(dataset_filepath=DATASET_FILEPATH, max_workers=len(CATEGORY_TYPES)):
+    tree = HyruleTree(dataset_filepath)
+    tree.expand_all(max_workers)
+    return tree.root_nodes
 
 def serialize_tree(node):
     node_dict = {'name': node.name, 'type': node.type, 'children': []}
@@ -81,11 +161,12 @@ def read_tree_from_json(json_file):
         data = json.load(file)
 
     def construct_tree(node_data):
-        node = TreeNode(node_data['name'], node_data['type'])
-        for child_data in node_data.get('children', []):
-            child_node = construct_tree(child_data)
-            node.add_child(child_node)
-        return node
+        children_data = node_data.get('children', [])
+
+        def load_children(node):
+            return [construct_tree(child_data) for child_data in children_data]
+
+        return TreeNode(node_data['name'], node_data['type'], load_children=load_children)
 
     root_nodes = {}
     for key, value in data.items():
@@ -116,54 +197,129 @@ def fetch_and_display_creatures():
             print(creature['name'])
 
 def process_entries(input_filepath, output_filepath):
-    with open(input_filepath, 'r') as file:
-        data = json.load(file)
+    build_derived_files(input_filepath, [HeartsIndex(output_filepath)])
 
-    hearts_recovered_entries = {}
-    for key, entry in data.items():
-        if 'hearts_recovered' in entry:
-            hearts_recovered_entries[key] = {
-                'name': entry['name'],
-                'common_locations': entry.get('common_locations', []),
-                'hearts_recovered': entry['hearts_recovered'],
-                'image': entry['image']
-            }
 
-    with open(output_filepath, 'w') as file:
-        json.dump(hearts_recovered_entries, file, indent=4)
+def update_hearts_index(filepath, dataset, changes):
+    """Applies the entry < changes > returned by < zelda_functions.sync_entries > to the
+    hearts index at < filepath >, leaving every other record as it is. The index is built
+    in full if it does not exist yet.
+    """
 
+    try:
+        hearts = utl.read_json(filepath)
+    except FileNotFoundError:
+        changes = {'added': list(dataset), 'updated': [], 'removed': []}
+        hearts = {}
+
+    for key in changes['added'] + changes['updated']:
+        if 'hearts_recovered' in dataset[key]:
+            hearts[key] = hearts_record(dataset[key])
+        else:
+            hearts.pop(key, None)
+    for key in changes['removed']:
+        hearts.pop(key, None)
+    utl.save_data_to_json(dict(sorted(hearts.items(), key=lambda item: int(item[0]))), filepath)
+
+
+def update_tree_json(filepath, dataset, changes):
+    """Applies the entry < changes > returned by < zelda_functions.sync_entries > to the
+    serialized tree at < filepath >. Only the categories holding changed entries are
+    touched. Does nothing if the tree has not been built yet.
+    """
 
+    try:
+        tree = utl.read_json(filepath)
+    except FileNotFoundError:
+        return
+
+    categories = {name.lower(): name for name in CATEGORY_TYPES}
+    touched = set()
+    for key in changes['updated'] + changes['removed']:
+        previous = changes['previous'][key]
+        name = categories.get(previous['category'])
+        if name in tree:
+            tree[name]['children'] = [child for child in tree[name]['children'] if child['name'] != previous['name']]
+            touched.add(name)
+    for key in changes['added'] + changes['updated']:
+        entry = dataset[key]
+        name = categories.get(entry['category'])
+        if name is None:
+            continue
+        node = tree.setdefault(name, {'name': name, 'type': 'Category', 'children': []})
+        node['children'].append({'name': entry['name'], 'type': CATEGORY_TYPES[name], 'children': []})
+        touched.add(name)
+
+    ids = {entry['name']: entry['id'] for entry in dataset.values()}
+    for name in touched:
+        tree[name]['children'].sort(key=lambda child: ids.get(child['name'], float('inf')))
+    utl.save_data_to_json(tree, filepath)
+
+
+def sync_local_data(dataset_filepath=DATASET_FILEPATH, metadata_filepath=SYNC_METADATA_FILEPATH,
+                    tree_filepath=TREE_FILEPATH, hearts_filepath=utl.HEARTS_FILEPATH,
+                    make_outputs=default_outputs, **options):
+    """Incrementally refreshes the local dataset with < zelda_functions.sync_entries > and
+    updates the derived files only if entries changed: the hearts index and tree are
+    patched in place, the other views returned by < make_outputs > are rebuilt in one
+    streaming pass over the saved dataset. Keyword < options > are passed on to
+    < zelda_functions.sync_entries >.
 
-def main():
+    Returns:
+        dict: the changes reported by < zelda_functions.sync_entries >
+    """
 
-#Retrieve Tree
-    json_filename = 'hyrule_tree.json'
+    try:
+        dataset = {str(key): entry for key, entry in utl.read_json(dataset_filepath).items()}
+    except FileNotFoundError:
+        dataset = {}
+    try:
+        metadata = utl.read_json(metadata_filepath)
+    except FileNotFoundError:
+        metadata = {}
+
+    changes = utl.sync_entries(dataset, metadata, **options)
+    if changes['added'] or changes['updated'] or changes['removed']:
+        utl.save_data_to_json(dict(sorted(dataset.items(), key=lambda item: int(item[0]))), dataset_filepath)
+        update_hearts_index(hearts_filepath, dataset, changes)
+        update_tree_json(tree_filepath, dataset, changes)
+        build_derived_files(dataset_filepath, [output for output in make_outputs()
+                                               if not isinstance(output, (HeartsIndex, CategoryTree))])
+    utl.save_data_to_json(metadata, metadata_filepath)
+
+    print(f"Checked {changes['checked']} entries: {len(changes['added'])} added, "
+          f"{len(changes['updated'])} updated, {len(changes['removed'])} removed, "
+          f"{changes['unchanged']} unchanged.")
+    return changes
 
-    if not os.path.exists(json_filename):
-        root_nodes = build_tree()
-        tree_json = {name: serialize_tree(node) for name, node in root_nodes.items()}
-        with open(json_filename, 'w') as file:
-            json.dump(tree_json, file, indent=4)
-        print(f"Created new tree JSON file: {json_filename}")
-    else:
-        print(f"Tree JSON file already exists: {json_filename}")
+
+def main():
 
 #Retrieve JSON
     filename = 'hyrule_retrieved.json'
 
-    if not os.path.exists(filename):
-        data = utl.fetch_data_until_invalid(1)
+    fetched = not os.path.exists(filename)
+    if fetched:
+        try:
+            data = utl.fetch_data_concurrently(1)
+        except requests.exceptions.RequestException as e:
+            sys.exit(f"Fetching data failed, '{filename}' not written: {e}")
         utl.save_data_to_json(data, filename)
     else:
-        print(f"'{filename}' already exists. Fetching data skipped.")
+        print(f"'{filename}' already exists. Fetching data skipped (run 'python final_project.py sync' to refresh it).")
 
-    input_filepath = 'hyrule_retrieved.json'
-    output_filepath = 'hearts_recovered_entries.json'
-
-    process_entries(input_filepath, output_filepath)
+#Build derived files (hearts index, tree, name index, category stats) in one pass: all of
+#them after a fetch, else only the missing ones, since the sync keeps the others up to date.
+    outputs = [output for output in default_outputs() if fetched or not os.path.exists(output.filepath)]
+    if outputs:
+        build_derived_files(filename, outputs)
+        print(f"Built derived files: {', '.join(output.filepath for output in outputs)}")
 
 
 
 if __name__ == "__main__":
-    main()
-    app.run(debug=True)
+    if sys.argv[1:] == ['sync']:
+        sync_local_data()
+    else:
+        main()
+        app.run(debug=True)
@@ -0,0 +1,541 @@
+"""Persistent and in-memory cache stores for compendium lookups.
+
+A persistent store is any dictionary-like object with get, __setitem__, update,
+__contains__, __len__ and items. < LogCache > (an append-only JSON lines file) and
+< SQLiteCache > (a SQLite database in WAL mode) are both safe to share between processes,
+e.g. the workers of a gunicorn deployment, and an entry written by one process is
+visible to the others on their next lookup. < zelda_functions.create_cache > picks the
+store from the file name, so another backend only needs to implement the same methods.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends stay atomic per write, but there is no cross-process lock
+    fcntl = None
+
+
+class LogCache:
+    """Dictionary-like cache persisted as an append-only JSON lines log. Each cache miss
+    appends a single [key, value] line, so persisting an entry costs the same no matter
+    how large the cache is. Only the position of each key's latest line is kept in memory,
+    and values are read back from the log when they are looked up. Once the log holds many
+    superseded lines it is compacted by writing a fresh log to a temporary file and
+    atomically replacing the old one.
+
+    With < ttl > set, values stored as {'fetched_at': <unix time>, ...} records (the format
+    written by < TieredCache >) are dropped by compaction once they are older than < ttl >
+    seconds, as are values without a timestamp, which < TieredCache > never serves. Whether
+    to compact is decided from the line and key counts alone, so a write never scans the
+    index; expired records are only looked for while compacting.
+
+    Writers in different processes are serialized with an advisory lock on a sidecar
+    '<filepath>.lock' file, and compaction merges the lines other processes appended
+    before it rewrites the log, so concurrent workers never clobber each other's entries.
+    Every read first indexes the lines appended since the log was last read (or re-indexes
+    it if another process compacted it), so entries written by other processes are seen
+    without a restart.
+
+    Parameters:
+        filepath (str): path to the log file
+        compact_threshold (int): minimum number of log lines before compaction is considered
+        ttl (float|None): seconds a timestamped record is kept by compaction, or None to keep every record
+    """
+
+    def __init__(self, filepath, compact_threshold=1000, ttl=None):
+        self.filepath = filepath
+        self.compact_threshold = compact_threshold
+        self.ttl = ttl
+        self._index = {}  # key -> (offset, length, fetched_at) of its latest line
+        self._log_lines = 0
+        self._offset = 0  # bytes of the log indexed in < _index >
+        self._file_id = None  # (device, inode) of the log file that was indexed
+        self._lock = threading.RLock()
+        self.load()
+
+    def __contains__(self, key):
+        self._sync()
+        return key in self._index
+
+    def __getitem__(self, key):
+        with self._lock:
+            file = self._open()
+            if file is None or key not in self._index:
+                raise KeyError(key)
+            with file:
+                return self._read(file, key)
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def __len__(self):
+        self._sync()
+        return len(self._index)
+
+    def update(self, values):
+        """Persists every key and value of < values > with a single append, e.g. all the
+        entries fetched for one batch lookup.
+        """
+
+        values = dict(values)
+        if not values:
+            return
+        lines = ''.join(json.dumps([key, value]) + '\n' for key, value in values.items())
+        with self._lock:
+            with self._locked():
+                with open(self.filepath, 'a', encoding='utf-8') as file:
+                    file.write(lines)
+                self._sync()  # indexes the new lines, and any appended by other processes before them
+            if self._log_lines > max(self.compact_threshold, 2 * len(self._index)):
+                self.compact()
+
+    def __iter__(self):
+        self._sync()
+        return iter(list(self._index))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def items(self):
+        """Returns every (key, value) pair, reading the values from the log."""
+
+        with self._lock:
+            file = self._open()
+            if file is None:
+                return []
+            with file:
+                return [(key, self._read(file, key)) for key in list(self._index)]
+
+    def load(self):
+        """Indexes the log from the start. A trailing partial line left by an interrupted
+        write is ignored, and a line holding a whole JSON object (the format written by
+        < zelda_functions.save_cache >) is indexed under each of its keys so older caches
+        can be migrated.
+        """
+
+        with self._lock:
+            self._file_id = None
+            self._sync()
+
+    def compact(self):
+        """Rewrites the log so it holds exactly one line per key, leaving out the records
+        that expired according to < ttl >.
+        """
+
+        with self._lock, self._locked():
+            file = self._open()
+            now = time.time()
+            tmp_filepath = f"{self.filepath}.tmp"
+            index = {}
+            position = 0
+            with open(tmp_filepath, 'wb') as tmp_file:
+                for key, (offset, length, fetched_at) in (self._index.items() if file is not None else ()):
+                    if self._is_expired(fetched_at, now):
+                        continue
+                    file.seek(offset)
+                    line = file.read(length).rstrip()
+                    if not line.startswith(b'['):  # a whole-object line: keep only this key
+                        line = json.dumps([key, self._read(file, key)]).encode('utf-8')
+                    tmp_file.write(line + b'\n')
+                    index[key] = (position, len(line) + 1, fetched_at)
+                    position += len(line) + 1
+                tmp_file.flush()
+                os.fsync(tmp_file.fileno())
+                stat = os.fstat(tmp_file.fileno())
+            if file is not None:
+                file.close()
+            os.replace(tmp_filepath, self.filepath)
+            self._file_id = (stat.st_dev, stat.st_ino)
+            self._index, self._log_lines, self._offset = index, len(index), position
+
+    def _sync(self):
+        # Indexes the complete lines appended since the last read. When the log was replaced
+        # (compacted by another process) or truncated, it is indexed again from the start.
+        with self._lock:
+            try:
+                stat = os.stat(self.filepath)
+                if (stat.st_dev, stat.st_ino) == self._file_id and stat.st_size == self._offset:
+                    return
+                file = open(self.filepath, 'rb')
+            except FileNotFoundError:
+                self._index, self._log_lines, self._offset, self._file_id = {}, 0, 0, None
+                return
+            with file:
+                stat = os.fstat(file.fileno())
+                if (stat.st_dev, stat.st_ino) != self._file_id or stat.st_size < self._offset:
+                    self._index, self._log_lines, self._offset = {}, 0, 0
+                self._file_id = (stat.st_dev, stat.st_ino)
+                file.seek(self._offset)
+                for line in file:
+                    if not line.endswith(b'\n'):
+                        break  # a partial last line is indexed once it is complete
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        record = None
+                    if isinstance(record, dict):
+                        for key, value in record.items():
+                            self._index[key] = (self._offset, len(line), _fetched_at(value))
+                    elif isinstance(record, list) and len(record) == 2:
+                        self._index[record[0]] = (self._offset, len(line), _fetched_at(record[1]))
+                    self._log_lines += 1
+                    self._offset += len(line)
+
+    def _open(self):
+        # Opens the log file described by < _index >, indexing it again if another process
+        # replaced it in the meantime. Returns None if there is no log file.
+        while True:
+            self._sync()
+            try:
+                file = open(self.filepath, 'rb')
+            except FileNotFoundError:
+                return None
+            stat = os.fstat(file.fileno())
+            if (stat.st_dev, stat.st_ino) == self._file_id:
+                return file
+            file.close()
+
+    def _read(self, file, key):
+        offset, length, _ = self._index[key]
+        file.seek(offset)
+        record = json.loads(file.read(length))
+        return record[key] if isinstance(record, dict) else record[1]
+
+    def _is_expired(self, fetched_at, now):
+        return self.ttl is not None and (fetched_at is None or now - fetched_at >= self.ttl)
+
+    def _locked(self):
+        return _FileLock(f"{self.filepath}.lock")
+
+
+def _fetched_at(value):
+    # The timestamp of a < TieredCache > record, or None for any other value.
+    fetched_at = value.get('fetched_at') if isinstance(value, dict) else None
+    return fetched_at if isinstance(fetched_at, (int, float)) and not isinstance(fetched_at, bool) else None
+
+
+class SQLiteCache:
+    """Dictionary-like cache stored in a SQLite database in WAL mode, so any number of
+    processes can read while one writes, and every lookup sees the entries committed by
+    other processes. Values are stored as JSON and only read from the database when they
+    are looked up. Each thread (and each forked process) opens its own connection.
+
+    With < ttl > set, writes delete the records that expired like < LogCache > compaction
+    drops them, at most once every < purge_interval > seconds per process.
+
+    Parameters:
+        filepath (str): path to the database file
+        timeout (float): seconds to wait for another process's write lock
+        ttl (float|None): seconds a timestamped record is kept, or None to keep every record
+        purge_interval (float): minimum seconds between two purges of expired records
+    """
+
+    def __init__(self, filepath, timeout=30, ttl=None, purge_interval=60 * 60):
+        self.filepath = filepath
+        self.timeout = timeout
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._next_purge = 0
+        self._local = threading.local()
+        self._connection().execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+    def __contains__(self, key):
+        return self._connection().execute('SELECT 1 FROM cache WHERE key = ?', (key,)).fetchone() is not None
+
+    def __getitem__(self, key):
+        row = self._connection().execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def __setitem__(self, key, value):
+        self.update({key: value})
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def __iter__(self):
+        return iter([key for key, in self._connection().execute('SELECT key FROM cache')])
+
+    def update(self, values):
+        """Writes every key and value of < values > in one transaction."""
+
+        rows = [(key, json.dumps(value)) for key, value in dict(values).items()]
+        if not rows:
+            return
+        with self._connection() as connection:
+            connection.executemany('INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)', rows)
+        if self.ttl is not None and time.time() >= self._next_purge:
+            self.purge()
+
+    def purge(self):
+        """Deletes the records older than < ttl > and the values without a timestamp."""
+
+        self._next_purge = time.time() + self.purge_interval
+        if self.ttl is None:
+            return
+        with self._connection() as connection:
+            connection.execute("DELETE FROM cache WHERE coalesce(json_type(value, '$.fetched_at'), '') "
+                               "NOT IN ('integer', 'real') OR json_extract(value, '$.fetched_at') <= ?",
+                               (time.time() - self.ttl,))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def items(self):
+        return [(key, json.loads(value)) for key, value in self._connection().execute('SELECT key, value FROM cache')]
+
+    def _connection(self):
+        # sqlite3 connections may not be shared between threads, nor survive a fork.
+        pid, connection = getattr(self._local, 'connection', (None, None))
+        if pid != os.getpid():
+            connection = sqlite3.connect(self.filepath, timeout=self.timeout)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = (os.getpid(), connection)
+        return connection
+
+
+class TieredCache:
+    """Two-tier cache: a bounded in-process LRU in front of a persistent < store > such as
+    < LogCache >. Entries older than < ttl > seconds are treated as missing in both tiers,
+    so stale API data is fetched again instead of being served forever. Values are written
+    to the store as {'fetched_at': <unix time>, 'data': <value>} records; store values
+    without a timestamp are considered expired.
+
+    With < stale_after > and < refresh > set, an entry older than < stale_after > (but still
+    within < ttl >) is served immediately and refreshed in the background by calling
+    refresh(key) (stale-while-revalidate). Keys marked with < mark_missing > are reported
+    by < is_missing > for < negative_ttl > seconds, so repeated lookups of unknown names do
+    not reach the API.
+
+    Parameters:
+        store (dict-like): persistent store backing the in-memory tier, or None
+        max_size (int): maximum number of entries kept in memory
+        ttl (float|None): seconds an entry stays usable, or None to never expire entries
+        stale_after (float|None): age in seconds after which an entry is refreshed
+        refresh (callable|None): returns the new value for a key, or None to keep the old one
+        negative_ttl (float|None): seconds a "not found" result is remembered
+    """
+
+    def __init__(self, store=None, max_size=512, ttl=None, stale_after=None, refresh=None, negative_ttl=None):
+        self.store = store
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self.refresh = refresh
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.negative_hits = 0
+        self._memory = OrderedDict()
+        self._missing = OrderedDict()
+        self._refreshing = set()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        fetched_at = time.time()
+        with self._lock:
+            self._missing.pop(key, None)
+            self._remember(key, value, fetched_at)
+        if self.store is not None:
+            self.store[key] = {'fetched_at': fetched_at, 'data': value}
+
+    def __len__(self):
+        return len(self._memory)
+
+    def update(self, values):
+        """Caches every key and value of < values >, writing them to the persistent store in
+        one call when the store has an update method (as < LogCache > does).
+        """
+
+        fetched_at = time.time()
+        records = {}
+        with self._lock:
+            for key, value in dict(values).items():
+                self._missing.pop(key, None)
+                self._remember(key, value, fetched_at)
+                records[key] = {'fetched_at': fetched_at, 'data': value}
+        if self.store is None or not records:
+            return
+        if hasattr(self.store, 'update'):
+            self.store.update(records)
+        else:
+            for key, record in records.items():
+                self.store[key] = record
+
+    def get(self, key, default=None):
+        """Returns the usable value cached under < key >, looking in memory first and then
+        in the persistent store, or < default > if there is none. Store hits are promoted
+        to the in-memory tier, and stale hits schedule a background refresh.
+        """
+
+        with self._lock:
+            if key in self._memory:
+                value, fetched_at = self._memory[key]
+                if self._is_fresh(fetched_at):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self._revalidate(key, fetched_at)
+                    return value
+                del self._memory[key]
+                self.expirations += 1
+
+        record = self.store.get(key) if self.store is not None else None
+        with self._lock:
+            if isinstance(record, dict) and 'fetched_at' in record and self._is_fresh(record['fetched_at']):
+                self.disk_hits += 1
+                self._remember(key, record['data'], record['fetched_at'])
+                self._revalidate(key, record['fetched_at'])
+                return record['data']
+            if record is not None:
+                self.expirations += 1
+            self.misses += 1
+        return default
+
+    def mark_missing(self, key):
+        """Remembers that the upstream API has no entry for < key >."""
+
+        if not self.negative_ttl:
+            return
+        with self._lock:
+            self._missing[key] = time.time()
+            self._missing.move_to_end(key)
+            while len(self._missing) > self.max_size:
+                self._missing.popitem(last=False)
+
+    def is_missing(self, key):
+        """Returns True if < key > was marked missing less than < negative_ttl > seconds ago."""
+
+        with self._lock:
+            marked_at = self._missing.get(key)
+            if marked_at is None:
+                return False
+            if time.time() - marked_at < self.negative_ttl:
+                self.negative_hits += 1
+                return True
+            del self._missing[key]
+            return False
+
+    def warm(self, entries):
+        """Loads < entries > (e.g. the values of 'hyrule_retrieved.json') into the in-memory
+        tier keyed by entry name. Warmed entries are not written to the persistent store.
+
+        Parameters:
+            entries (iterable): compendium entry dictionaries
+
+        Returns:
+            int: number of entries loaded
+        """
+
+        fetched_at = time.time()
+        count = 0
+        with self._lock:
+            for entry in entries:
+                self._remember(entry['name'], entry, fetched_at)
+                count += 1
+        return count
+
+    def stats(self):
+        """Returns the hit/miss/eviction counters and the current in-memory size."""
+
+        with self._lock:
+            return {
+                'size': len(self._memory),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'stale_hits': self.stale_hits,
+                'refreshes': self.refreshes,
+                'refresh_failures': self.refresh_failures,
+                'negative_hits': self.negative_hits,
+            }
+
+    def _is_fresh(self, fetched_at):
+        return self.ttl is None or time.time() - fetched_at < self.ttl
+
+    def _revalidate(self, key, fetched_at):
+        # Called with the lock held.
+        if self.refresh is None or self.stale_after is None or time.time() - fetched_at < self.stale_after:
+            return
+        self.stale_hits += 1
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='cache-refresh')
+        self._executor.submit(self._refresh_entry, key)
+
+    def _refresh_entry(self, key):
+        try:
+            value = self.refresh(key)
+            if value is not None:
+                self[key] = value
+                with self._lock:
+                    self.refreshes += 1
+        except Exception as e:  # the executor would otherwise keep the exception in a future nobody reads
+            with self._lock:
+                self.refresh_failures += 1
+            print(f"Error refreshing cache entry {key!r}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _remember(self, key, value, fetched_at):
+        self._memory[key] = (value, fetched_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+
+class _FileLock:
+    """Exclusive advisory lock held on < filepath > for the duration of a with block."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.filepath, 'a')
+        if fcntl:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
@@ -0,0 +1,165 @@
+"""Cooking optimizer over the ingredients in 'hyrule_retrieved.json'.
+
+A dish holds at most < MAX_INGREDIENTS > ingredients (copies of the same ingredient
+allowed), recovers the sum of their hearts_recovered, and keeps a cooking effect only if
+every ingredient with an effect has the same one: mixing effects cancels them, while
+ingredients without an effect never do. So a dish with a required effect uses at least
+one ingredient with that effect and otherwise only neutral ones.
+
+Ingredients with the same hearts and effect are interchangeable, and < CookingIndex >
+groups them per effect once, so a query only searches a few dozen groups. The search is
+a depth-first branch and bound over the groups in descending order of hearts: a branch
+is cut as soon as its most optimistic outcome (every remaining slot filled with the
+best remaining group) cannot beat the worst of the < top_k > dishes found so far.
+"""
+
+from bisect import insort
+from itertools import count
+
+import zelda_functions as utl
+import hyrule_metrics as metrics
+
+MAX_INGREDIENTS = 5
+COOKING_CATEGORIES = ('materials', 'creatures')
+
+
+def cooking_effect(entry):
+    effect = entry.get('cooking_effect')
+    return effect.lower() if isinstance(effect, str) and effect.strip() else None
+
+
+class CookingIndex:
+    """Cooking ingredients grouped by (hearts, effect), built once from the compendium
+    entries, e.g. the values of 'hyrule_retrieved.json'. Materials and creatures count as
+    ingredients when they recover hearts or have a cooking effect.
+
+    Parameters:
+        entries (iterable): compendium entry dictionaries
+    """
+
+    def __init__(self, entries):
+        groups = {}
+        for entry in entries:
+            if entry.get('category') not in COOKING_CATEGORIES or entry.get('edible') is False:
+                continue
+            hearts = utl.convert_to_numeric(entry.get('hearts_recovered'))
+            hearts = hearts if isinstance(hearts, (int, float)) and hearts > 0 else 0
+            effect = cooking_effect(entry)
+            if hearts or effect:
+                groups.setdefault((round(hearts * utl.HEART_SCALE), effect), []).append(entry)
+        # Descending hearts, so the first remaining group bounds what any later slot can add.
+        self.groups = sorted(groups.items(), key=lambda group: (-group[0][0], group[0][1] or ''))
+        self.by_effect = {None: self.groups}
+        for effect in sorted({effect for (_, effect), _ in self.groups if effect}):
+            self.by_effect[effect] = [group for group in self.groups if group[0][1] in (effect, None)]
+
+    def effects(self):
+        """Returns the known cooking effects in alphabetical order."""
+
+        return [effect for effect in self.by_effect if effect]
+
+    def cook(self, hearts_needed=None, effect=None, exact=False, max_ingredients=MAX_INGREDIENTS,
+             inventory=None, only_inventory=False, exclude=(), top_k=1):
+        """Finds the best dishes of at most < max_ingredients > ingredients. Without
+        < hearts_needed > the dishes recovering the most hearts come first; with it, the
+        dishes recovering the most hearts up to < hearts_needed > (or exactly
+        < hearts_needed > if < exact >), then those with the fewest ingredients.
+
+        Parameters:
+            hearts_needed (float|None): hearts to recover, or None to maximize hearts
+            effect (str|None): cooking effect the dish must have
+            exact (bool): only accept dishes recovering exactly < hearts_needed >
+            max_ingredients (int): maximum number of ingredients, at most < MAX_INGREDIENTS >
+            inventory (dict|None): maps ingredient names to the number of copies available
+            only_inventory (bool): use only the ingredients listed in < inventory >;
+                                   otherwise unlisted ingredients are unlimited
+            exclude (iterable): names of ingredients that must not be used
+            top_k (int): number of dishes to return
+
+        Returns:
+            list: dicts with 'ingredients', 'hearts' and 'effect', best first
+        """
+
+        effect = effect.lower() if effect else None
+        if effect not in self.by_effect or top_k < 1 or (exact and hearts_needed is None):
+            return []
+        slots = max(0, min(max_ingredients, MAX_INGREDIENTS))
+        target = None if hearts_needed is None else utl.scale_target(hearts_needed, 1)
+        if exact and not utl.is_scaled_exactly(hearts_needed, target, 1):
+            return []
+        inventory = {name.lower(): count for name, count in (inventory or {}).items()}
+        excluded = {name.lower() for name in exclude}
+
+        groups = []
+        for (hearts, group_effect), items in self.by_effect[effect]:
+            items = [item for item in items if item['name'].lower() not in excluded
+                     and inventory.get(item['name'].lower(), 0 if only_inventory else 1) > 0]
+            counts = [inventory.get(item['name'].lower()) for item in items]
+            cap = slots if None in counts else min(slots, sum(counts))
+            if cap > 0:
+                groups.append((hearts, group_effect, items, cap))
+        # Index of the last group carrying the required effect: past it, no dish can get it.
+        last_effect = max((i for i, group in enumerate(groups) if group[1] == effect), default=-1)
+
+        def rank(total, used):
+            return (used,) if exact else (-total, used)
+
+        best = []  # (rank, sequence, chosen, total), best first
+        sequence = count()
+        chosen = []
+
+        def consider(total, used, has_effect):
+            if (effect and not has_effect) or (target is not None and (total > target or exact and total != target)):
+                return
+            key = rank(total, used)
+            if len(best) < top_k or key < best[-1][0]:
+                insort(best, (key, next(sequence), list(chosen), total))
+                del best[top_k:]
+
+        def search(start, free, total, has_effect):
+            used = slots - free
+            for i in range(start, len(groups)):
+                hearts, group_effect, _, cap = groups[i]
+                if effect and not has_effect and i > last_effect:
+                    break
+                reachable = total + free * hearts
+                if exact and reachable < target:
+                    break
+                bound = reachable if target is None else min(reachable, target)
+                if len(best) == top_k and rank(bound, used + 1) > best[-1][0]:
+                    break
+                if not hearts and (not effect or has_effect):
+                    break  # the remaining groups add no hearts, only an effect the dish has or needs not
+                for copies in range(1 if not hearts else min(cap, free), 0, -1):
+                    new_total = total + copies * hearts
+                    if target is not None and new_total > target:
+                        continue
+                    chosen.append((i, copies))
+                    consider(new_total, used + copies, has_effect or group_effect == effect)
+                    if copies < free:
+                        search(i + 1, free - copies, new_total, has_effect or group_effect == effect)
+                    chosen.pop()
+
+        with metrics.SOLVE_DURATION.time(solver='cooking'):
+            search(0, slots, 0, False)
+
+        dishes = []
+        for _, _, picks, total in best:
+            ingredients = []
+            effects = set()
+            for i, copies in picks:
+                _, group_effect, items, _ = groups[i]
+                ingredients.extend(utl.assign_group_copies(items, copies, inventory))
+                effects.add(group_effect)
+            effects.discard(None)
+            dishes.append({
+                'ingredients': ingredients,
+                'hearts': total / utl.HEART_SCALE,
+                'effect': effects.pop() if len(effects) == 1 else None,
+            })
+        return dishes
+
+
+def describe_dish(dish):
+    description = utl.describe_combination(dish['ingredients'])
+    return f"{description} ({dish['effect']})" if dish['effect'] else description
@@ -0,0 +1,345 @@
+"""In-memory indexes over the local compendium dataset ('hyrule_retrieved.json')."""
+
+import re
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+import zelda_functions as utl
+
+DATASET_FILEPATH = 'hyrule_retrieved.json'
+
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = range(5)
+MATCH_NAMES = ('exact', 'prefix', 'word_prefix', 'substring', 'fuzzy')
+
+# Query filter name → entry field, for fields matched by value.
+FILTER_FIELDS = {
+    'category': 'category',
+    'location': 'common_locations',
+    'drop': 'drops',
+    'cooking_effect': 'cooking_effect',
+    'dlc': 'dlc',
+    'edible': 'edible',
+}
+# Query range name → path of the numeric entry field.
+RANGE_FIELDS = {
+    'hearts': ('hearts_recovered',),
+    'attack': ('properties', 'attack'),
+    'defense': ('properties', 'defense'),
+}
+BOOLEAN_FIELDS = ('dlc', 'edible')
+
+
+def normalize_key(key):
+    """Returns < key > lowercased with underscores treated as spaces and runs of whitespace
+    collapsed, so 'Hylian_Shroom', ' hylian  shroom ' and 'hylian shroom' all match.
+
+    Parameters:
+        key (str|int): entry name or ID
+
+    Returns:
+        str: normalized lookup key
+    """
+
+    return re.sub(r'[\s_]+', ' ', str(key)).strip().lower()
+
+
+class CompendiumIndex:
+    """Maps normalized entry names and numeric IDs to compendium entries so that known
+    entries are resolved in O(1) without any HTTP request. < by_id > maps IDs to entries
+    and < by_name > maps normalized names to IDs.
+
+    Parameters:
+        entries (iterable): compendium entry dictionaries
+    """
+
+    def __init__(self, entries):
+        self.by_id = {}
+        self.by_name = {}
+        for entry in entries:
+            self.by_id[int(entry['id'])] = entry
+            self.by_name[normalize_key(entry['name'])] = int(entry['id'])
+
+    @classmethod
+    def from_json(cls, filepath=DATASET_FILEPATH):
+        """Builds the index from a dataset file keyed by entry ID."""
+
+        return cls(utl.read_json(filepath).values())
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, key):
+        return self.lookup(key) is not None
+
+    def lookup(self, key):
+        """Returns the entry whose ID or normalized name matches < key >, or None.
+
+        Parameters:
+            key (str|int): entry name or ID, e.g. 'Hylian Shroom', 'hylian_shroom' or '165'
+
+        Returns:
+            dict|None: the matching entry
+        """
+
+        normalized = normalize_key(key)
+        entry_id = int(normalized) if normalized.isascii() and normalized.isdecimal() else self.by_name.get(normalized)
+        return None if entry_id is None else self.by_id.get(entry_id)
+
+
+def trigrams(text):
+    """Returns the set of three-character substrings of < text > padded with spaces, so
+    that the start and end of a name produce their own trigrams.
+    """
+
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, max_distance, prefix=False):
+    """Returns the Levenshtein distance between < a > and < b >, or < max_distance > + 1 as
+    soon as it is known to exceed < max_distance >. Only the diagonal band of width
+    2 * max_distance + 1 is computed, since cells outside it always exceed the limit.
+    With < prefix >, returns the distance between < a > and the closest prefix of < b >
+    instead, so a misspelled partial name still matches the full name.
+    """
+
+    if len(a) - len(b) > max_distance or (not prefix and len(b) - len(a) > max_distance):
+        return max_distance + 1
+    limit = max_distance + 1
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        char_a = a[i - 1]
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [limit] * (len(b) + 1)
+        if low == 1:
+            current[0] = i
+        row_min = current[0] if low == 1 else limit
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (char_a != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return limit
+        previous = current
+    if prefix:
+        return min(min(previous), limit)
+    return min(previous[-1], limit)
+
+
+class SearchEngine:
+    """Ranked name search over compendium entries. Results are ordered by match type
+    (exact, prefix, word prefix, substring, then typo-tolerant fuzzy matches) and, within
+    a match type, by edit distance, name length and name.
+
+    Prefix and word-prefix queries use binary search over sorted name/word arrays,
+    substring queries intersect trigram posting lists, and fuzzy queries rank the names
+    sharing the most trigrams with the query by bounded edit distance to their closest
+    prefix, so misspelled partial names match too.
+
+    Parameters:
+        entries (iterable): compendium entry dictionaries
+        fuzzy_candidates (int): number of trigram-ranked names checked for typo matches
+    """
+
+    def __init__(self, entries, fuzzy_candidates=25):
+        self.fuzzy_candidates = fuzzy_candidates
+        self.entries = {}
+        for entry in entries:
+            self.entries.setdefault(normalize_key(entry['name']), entry)
+        self.names = sorted(self.entries)
+        words = sorted((word, name) for name in self.names for word in name.split(' ')[1:])
+        self.word_keys = [word for word, _ in words]
+        self.word_names = [name for _, name in words]
+        self.postings = defaultdict(set)
+        for name in self.names:
+            for gram in trigrams(name):
+                self.postings[gram].add(name)
+
+    @classmethod
+    def from_json(cls, filepath=DATASET_FILEPATH):
+        """Builds the search engine from a dataset file keyed by entry ID."""
+
+        return cls(utl.read_json(filepath).values())
+
+    def search(self, query, limit=10, fuzzy=True):
+        """Returns up to < limit > ranked matches for < query >.
+
+        Parameters:
+            query (str): full or partial entry name, possibly misspelled
+            limit (int): maximum number of results
+            fuzzy (bool): whether to include typo-tolerant matches
+
+        Returns:
+            list: dictionaries with the entry's 'name', 'id', 'category' and the 'match' type
+        """
+
+        query = normalize_key(query)
+        if not query:
+            return []
+
+        ranked = {}
+
+        def add(name, rank, distance=0):
+            key = (rank, distance, len(name), name)
+            if name not in ranked or key < ranked[name]:
+                ranked[name] = key
+
+        if query in self.entries:
+            add(query, EXACT)
+        for name in self._prefixed(self.names, self.names, query):
+            add(name, PREFIX)
+        for name in self._prefixed(self.word_keys, self.word_names, query):
+            add(name, WORD_PREFIX)
+        for name in self._containing(query):
+            add(name, SUBSTRING)
+        if fuzzy and len(ranked) < limit and query not in self.entries:
+            max_distance = max(1, min(3, len(query) // 4))
+            for name in self._fuzzy_candidates(query, max_distance):
+                distance = edit_distance(query, name, max_distance, prefix=True)
+                if distance <= max_distance:
+                    add(name, FUZZY, distance)
+
+        results = []
+        for rank, distance, _, name in sorted(ranked.values())[:limit]:
+            entry = self.entries[name]
+            results.append({'name': entry['name'], 'id': entry['id'], 'category': entry['category'],
+                            'match': MATCH_NAMES[rank]})
+        return results
+
+    @staticmethod
+    def _prefixed(keys, names, query):
+        i = bisect_left(keys, query)
+        while i < len(keys) and keys[i].startswith(query):
+            yield names[i]
+            i += 1
+
+    def _containing(self, query):
+        if len(query) < 3:
+            return [name for name in self.names if query in name]
+        grams = [query[i:i + 3] for i in range(len(query) - 2)]
+        postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+        candidates = set.intersection(*postings)
+        return [name for name in candidates if query in name]
+
+    def _fuzzy_candidates(self, query, max_distance):
+        # The query may be a partial name, so the trigram marking its end is left out and
+        # longer names are kept. Each edit changes at most three trigrams, so names sharing
+        # fewer cannot match.
+        grams = trigrams(query) - {f"  {query} "[-3:]}
+        min_shared = len(grams) - 3 * max_distance
+        shared = defaultdict(int)
+        for gram in grams:
+            for name in self.postings.get(gram, ()):
+                shared[name] += 1
+        candidates = [name for name, count in shared.items()
+                      if count >= min_shared and len(name) >= len(query) - max_distance]
+        return sorted(candidates, key=shared.get, reverse=True)[:self.fuzzy_candidates]
+
+
+def normalize_value(value):
+    """Returns the form of a filter value used as an inverted index key: booleans become
+    'true'/'false' and text is normalized with < normalize_key >.
+    """
+
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return normalize_key(value)
+
+
+class QueryIndex:
+    """Structured filtering over compendium entries, backed by indexes built once up front.
+    Value filters (see < FILTER_FIELDS >) use inverted indexes from normalized value to the
+    set of matching rows, and range filters (see < RANGE_FIELDS >) use value-sorted arrays
+    searched with bisect. A query intersects the row sets of its filters, smallest first,
+    and returns one page of the matching entries in ID order.
+
+    Parameters:
+        entries (iterable): compendium entry dictionaries
+    """
+
+    def __init__(self, entries):
+        self.entries = sorted(entries, key=lambda entry: entry['id'])
+        self.postings = {name: defaultdict(set) for name in FILTER_FIELDS}
+        self.ranges = {}
+        for row, entry in enumerate(self.entries):
+            for name, field in FILTER_FIELDS.items():
+                value = entry.get(field)
+                if name in BOOLEAN_FIELDS:
+                    value = bool(value)
+                for item in value if isinstance(value, list) else [value]:
+                    if item is not None and item != '':
+                        self.postings[name][normalize_value(item)].add(row)
+        for name, path in RANGE_FIELDS.items():
+            pairs = []
+            for row, entry in enumerate(self.entries):
+                value = entry
+                for key in path:
+                    value = value.get(key) if isinstance(value, dict) else None
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    pairs.append((value, row))
+            pairs.sort()
+            self.ranges[name] = ([value for value, _ in pairs], [row for _, row in pairs])
+
+    @classmethod
+    def from_json(cls, filepath=DATASET_FILEPATH):
+        """Builds the query index from a dataset file keyed by entry ID."""
+
+        return cls(utl.read_json(filepath).values())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def values(self, name):
+        """Returns the indexed values of the value filter < name >, e.g. every location."""
+
+        return sorted(self.postings[name])
+
+    def query(self, filters=None, ranges=None, offset=0, limit=20):
+        """Returns the entries matching every filter, one page at a time.
+
+        Parameters:
+            filters (dict): value filter name → list of accepted values; an entry matches
+                            if any of its values is accepted
+            ranges (dict): range filter name → (minimum, maximum), either of which may be None
+            offset (int): number of matching entries to skip
+            limit (int): maximum number of entries returned
+
+        Returns:
+            dict: the 'total' number of matches, the 'offset' and 'limit' used, and the
+                  matching entries ('results') in ID order
+        """
+
+        row_sets = []
+        for name, accepted in (filters or {}).items():
+            if name not in self.postings:
+                raise ValueError(f"Unknown filter: {name}")
+            postings = self.postings[name]
+            row_sets.append(set().union(*(postings.get(normalize_value(value), ()) for value in accepted)))
+        for name, (low, high) in (ranges or {}).items():
+            if name not in self.ranges:
+                raise ValueError(f"Unknown range: {name}")
+            values, rows = self.ranges[name]
+            start = 0 if low is None else bisect_left(values, low)
+            end = len(values) if high is None else bisect_right(values, high)
+            row_sets.append(rows[start:end])
+
+        if row_sets:
+            row_sets.sort(key=len)
+            matched = set(row_sets[0])
+            for rows in row_sets[1:]:
+                if not matched:
+                    break
+                matched.intersection_update(rows)
+            total = len(matched)
+            page = sorted(matched)[offset:offset + limit]
+        else:
+            total = len(self.entries)
+            page = range(offset, min(offset + limit, total))
+        return {'total': total, 'offset': offset, 'limit': limit, 'results': [self.entries[row] for row in page]}
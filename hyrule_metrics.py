@@ -0,0 +1,268 @@
+"""Process-local metrics and an opt-in request profiler.
+
+Counters and histograms are kept in memory by the module-level < registry > and rendered
+in the Prometheus text exposition format by < Registry.render >, which the web app
+serves on /metrics. Values that other objects already track (such as the counters of
+< hyrule_cache.TieredCache >) are exported by collectors called at scrape time.
+
+When the < profiler > is enabled (at runtime through /profiling, or at startup with the
+HYRULE_PROFILE=1 environment variable), every request runs under cProfile and its stats
+are written to '<directory>/<time>-<endpoint>.prof', to be read with pstats or snakeviz.
+Only the newest < PROFILE_MAX_DUMPS > dumps are kept.
+"""
+
+import cProfile
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_DIRECTORY = './profiles'
+PROFILE_MAX_DUMPS = 200
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count per combination of label values.
+
+    Parameters:
+        name (str): metric name, ending in '_total' by convention
+        help (str): description shown in the exposition output
+        labelnames (tuple): names of the labels every sample must set
+    """
+
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Distribution of observed values (e.g. latencies in seconds) in cumulative buckets.
+
+    Parameters:
+        name (str): metric name, ending in '_seconds' for durations
+        help (str): description shown in the exposition output
+        labelnames (tuple): names of the labels every sample must set
+        buckets (tuple): increasing upper bounds of the buckets
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the with block in seconds."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        counts, _ = self._values.get(tuple(str(labels[name]) for name in self.labelnames), ((), 0.0))
+        return sum(counts)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    samples.append((f"{self.name}_bucket", dict(labels, le=format_value(bound)), cumulative))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+class Registry:
+    """Collection of metrics rendered together on /metrics."""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """Adds < collector >, a callable returning a list of (name, type, help, samples)
+        tuples where samples is a list of (labels, value) pairs, evaluated at every scrape.
+        """
+
+        self.collectors.append(collector)
+        return collector
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(f"{name}{format_labels(labels)} {format_value(value)}" for name, labels, value in metric.samples())
+        families = {}  # collectors may contribute samples to the same metric
+        for collector in self.collectors:
+            for name, type, help, samples in collector():
+                families.setdefault(name, (type, help, []))[2].extend(samples)
+        for name, (type, help, samples) in families.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {type}")
+            lines.extend(f"{name}{format_labels(labels)} {format_value(value)}" for labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.histogram(
+    'hyrule_request_duration_seconds', 'Latency of HTTP requests handled by the web app.', ('route', 'method', 'status'))
+UPSTREAM_REQUESTS = registry.counter(
+    'hyrule_upstream_requests_total', 'Requests to the compendium API by outcome.', ('outcome',))
+UPSTREAM_DURATION = registry.histogram(
+    'hyrule_upstream_request_duration_seconds', 'Latency of requests to the compendium API.', ('outcome',))
+ITEM_LOOKUPS = registry.counter(
+    'hyrule_item_lookups_total', 'Item lookups by the source that answered them.', ('source',))
+SOLVE_DURATION = registry.histogram(
+    'hyrule_heart_solve_seconds', 'Time spent solving heart recovery combinations.', ('solver',))
+
+
+def record_upstream(outcome, seconds):
+    """Counts one compendium API request with < outcome > ('ok', 'not_modified',
+    'not_found', 'error' or 'circuit_open') that took < seconds >.
+    """
+
+    UPSTREAM_REQUESTS.inc(outcome=outcome)
+    UPSTREAM_DURATION.observe(seconds, outcome=outcome)
+
+
+def cache_collector(name, stats):
+    """Returns a collector exporting the counters returned by < stats >, e.g. the stats
+    method of a < hyrule_cache.TieredCache >, labelled with cache=< name >. < stats > must
+    return a dict of event counts plus the current 'size'.
+    """
+
+    def collect():
+        stats_now = stats()
+        events = [({'cache': name, 'event': event}, value) for event, value in stats_now.items()
+                  if event not in ('size', 'max_size')]
+        return [
+            ('hyrule_cache_events_total', 'counter', 'Cache hits, misses, evictions and refreshes.', events),
+            ('hyrule_cache_size', 'gauge', 'Entries held in memory by the cache.', [({'cache': name}, stats_now['size'])]),
+        ]
+
+    return collect
+
+
+class Profiler:
+    """Per-request cProfile profiler that can be switched on and off at runtime.
+
+    Parameters:
+        directory (str): where profile dumps are written
+        enabled (bool): whether requests are profiled
+        max_dumps (int): number of dumps kept; older ones are deleted as new ones are written
+    """
+
+    def __init__(self, directory=PROFILE_DIRECTORY, enabled=False, max_dumps=PROFILE_MAX_DUMPS):
+        self.directory = directory
+        self.enabled = enabled
+        self.max_dumps = max_dumps
+
+    def start(self):
+        """Returns a running cProfile.Profile if profiling is enabled, else None."""
+
+        if not self.enabled:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # another profiler is already active in this thread
+            return None
+        return profile
+
+    def stop(self, profile, name):
+        """Stops < profile > and writes its stats to a file named after < name >, then
+        deletes the oldest dumps beyond < max_dumps >.
+
+        Returns:
+            str: path of the dump
+        """
+
+        profile.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        safe_name = ''.join(char if char.isalnum() or char in '-_' else '_' for char in name)
+        filepath = os.path.join(self.directory, f"{time.time_ns()}-{safe_name}.prof")
+        profile.dump_stats(filepath)
+        for old_name in self.dumps()[self.max_dumps:]:
+            try:
+                os.remove(os.path.join(self.directory, old_name))
+            except FileNotFoundError:  # already deleted by another request
+                pass
+        return filepath
+
+    def dumps(self):
+        """Returns the names of the profile dumps written so far, newest first."""
+
+        try:
+            return sorted((name for name in os.listdir(self.directory) if name.endswith('.prof')), reverse=True)
+        except FileNotFoundError:
+            return []
+
+
+profiler = Profiler(enabled=os.environ.get('HYRULE_PROFILE') == '1')
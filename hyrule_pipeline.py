@@ -0,0 +1,219 @@
+"""Single-pass builder for the files derived from the local dataset ('hyrule_retrieved.json').
+
+The dataset is parsed incrementally, one entry at a time, and every entry is handed to
+each registered output, so all derived views are built from one read of the data and
+the whole dataset never has to be held in memory. An output is any object with
+add(key, entry) and finish() methods; subclass < DerivedOutput > to add a new view.
+
+Rebuild the derived files with:
+    python hyrule_pipeline.py [dataset.json]
+"""
+
+import json
+import re
+import sys
+
+import zelda_functions as utl
+from hyrule_index import normalize_key
+
+DATASET_FILEPATH = 'hyrule_retrieved.json'
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s*')
+
+CATEGORY_TYPES = {
+    'Monsters': 'Monster',
+    'Equipment': 'Equipment',
+    'Materials': 'Material',
+    'Creatures': 'Creature',
+    'Treasure': 'Treasure'
+}
+
+
+def iter_entries(filepath=DATASET_FILEPATH, chunk_size=CHUNK_SIZE):
+    """Yields the (key, entry) pairs of the top-level JSON object in < filepath >, reading
+    the file in < chunk_size > character chunks and decoding one member at a time.
+
+    Parameters:
+        filepath (str): path to a JSON file holding an object, e.g. entries keyed by ID
+        chunk_size (int): number of characters read at a time
+
+    Returns:
+        generator: (key, value) pairs in file order
+    """
+
+    decoder = json.JSONDecoder()
+    with open(filepath, 'r', encoding='utf-8') as file:
+        buffer, position = '', 0
+        opened = first = False
+        while True:
+            try:
+                cursor = _skip_whitespace(buffer, position)
+                if not opened:
+                    if buffer[cursor] != '{':
+                        raise ValueError(f"{filepath}: expected a JSON object")
+                    opened, position = True, cursor + 1
+                    continue
+                if buffer[cursor] == '}':
+                    return
+                if first:
+                    if buffer[cursor] != ',':
+                        raise ValueError(f"{filepath}: expected ',' at character {cursor}")
+                    cursor = _skip_whitespace(buffer, cursor + 1)
+                key, cursor = decoder.raw_decode(buffer, cursor)
+                cursor = _skip_whitespace(buffer, cursor)
+                if buffer[cursor] != ':':
+                    raise ValueError(f"{filepath}: expected ':' at character {cursor}")
+                value, cursor = decoder.raw_decode(buffer, _skip_whitespace(buffer, cursor + 1))
+                buffer[_skip_whitespace(buffer, cursor)]  # a number could continue in the next chunk
+            except (IndexError, json.JSONDecodeError) as error:
+                # The member is cut off at the end of the buffer: read more and retry it.
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f"{filepath}: invalid or truncated JSON") from error
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            yield key, value
+            first, position = True, cursor
+
+
+def _skip_whitespace(buffer, position):
+    return WHITESPACE.match(buffer, position).end()
+
+
+class DerivedOutput:
+    """Base class for a view built by < build_derived_files >. add() is called once per
+    entry in dataset order and finish() once at the end; when < filepath > is set, the
+    result is written there as indented JSON.
+
+    Parameters:
+        filepath (str|None): where to write the result, or None to only return it
+    """
+
+    def __init__(self, filepath=None):
+        self.filepath = filepath
+
+    def add(self, key, entry):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+    def finish(self):
+        result = self.result()
+        if self.filepath:
+            utl.save_data_to_json(result, self.filepath)
+        return result
+
+
+def hearts_record(entry):
+    return {
+        'name': entry['name'],
+        'common_locations': entry.get('common_locations', []),
+        'hearts_recovered': entry['hearts_recovered'],
+        'image': entry['image']
+    }
+
+
+class HeartsIndex(DerivedOutput):
+    """Entries that recover hearts, keyed by ID ('hearts_recovered_entries.json')."""
+
+    def __init__(self, filepath=utl.HEARTS_FILEPATH):
+        super().__init__(filepath)
+        self.entries = {}
+
+    def add(self, key, entry):
+        if 'hearts_recovered' in entry:
+            self.entries[key] = hearts_record(entry)
+
+    def result(self):
+        return self.entries
+
+
+class CategoryTree(DerivedOutput):
+    """The serialized category tree ('hyrule_tree.json'), in the same format as
+    < final_project.serialize_tree >. Children are listed in dataset (ID) order, the order
+    < final_project.update_tree_json > keeps when it patches the file.
+    """
+
+    def __init__(self, filepath='hyrule_tree.json'):
+        super().__init__(filepath)
+        self.categories = {name.lower(): name for name in CATEGORY_TYPES}
+        self.tree = {name: {'name': name, 'type': 'Category', 'children': []} for name in CATEGORY_TYPES}
+
+    def add(self, key, entry):
+        name = self.categories.get(entry.get('category'))
+        if name:
+            self.tree[name]['children'].append({'name': entry['name'], 'type': CATEGORY_TYPES[name], 'children': []})
+
+    def result(self):
+        return self.tree
+
+
+class NameIndex(DerivedOutput):
+    """Normalized entry name → ID (see < hyrule_index.normalize_key >)."""
+
+    def __init__(self, filepath='hyrule_names.json'):
+        super().__init__(filepath)
+        self.names = {}
+
+    def add(self, key, entry):
+        self.names.setdefault(normalize_key(entry['name']), entry['id'])
+
+    def result(self):
+        return self.names
+
+
+class CategoryStats(DerivedOutput):
+    """Per-category entry counts and heart recovery statistics."""
+
+    def __init__(self, filepath='hyrule_category_stats.json'):
+        super().__init__(filepath)
+        self.stats = {}
+
+    def add(self, key, entry):
+        stats = self.stats.setdefault(entry.get('category'), {
+            'entries': 0, 'dlc': 0, 'edible': 0, 'hearts_entries': 0,
+            'min_hearts': None, 'max_hearts': None, 'total_hearts': 0,
+        })
+        stats['entries'] += 1
+        stats['dlc'] += bool(entry.get('dlc'))
+        stats['edible'] += bool(entry.get('edible'))
+        hearts = entry.get('hearts_recovered')
+        if isinstance(hearts, (int, float)):
+            stats['hearts_entries'] += 1
+            stats['total_hearts'] += hearts
+            stats['min_hearts'] = hearts if stats['min_hearts'] is None else min(stats['min_hearts'], hearts)
+            stats['max_hearts'] = hearts if stats['max_hearts'] is None else max(stats['max_hearts'], hearts)
+
+    def result(self):
+        for stats in self.stats.values():
+            stats['mean_hearts'] = stats['total_hearts'] / stats['hearts_entries'] if stats['hearts_entries'] else None
+        return self.stats
+
+
+def default_outputs():
+    return [HeartsIndex(), CategoryTree(), NameIndex(), CategoryStats()]
+
+
+def build_derived_files(dataset_filepath=DATASET_FILEPATH, outputs=None):
+    """Reads < dataset_filepath > once and feeds every entry to each of < outputs >.
+
+    Parameters:
+        dataset_filepath (str): path to the dataset keyed by entry ID
+        outputs (list): < DerivedOutput >-like objects, defaults to < default_outputs >()
+
+    Returns:
+        list: the result of each output, in the order of < outputs >
+    """
+
+    outputs = default_outputs() if outputs is None else outputs
+    for key, entry in iter_entries(dataset_filepath):
+        for output in outputs:
+            output.add(key, entry)
+    return [output.finish() for output in outputs]
+
+
+if __name__ == '__main__':
+    outputs = default_outputs()
+    build_derived_files(*sys.argv[1:], outputs=outputs)
+    print(f"Wrote {', '.join(output.filepath for output in outputs)}")
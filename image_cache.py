@@ -0,0 +1,193 @@
+"""Content-addressed on-disk cache for compendium images.
+
+Image bytes are stored once per SHA-256 digest under '<directory>/objects/', and a small
+JSON record per source URL under '<directory>/urls/' maps the URL to its digest, content
+type and validators. The Flask app serves cached images from its own /image route, so
+page renders no longer depend on the upstream image host.
+
+Prefetch every image referenced by the local dataset with:
+    python image_cache.py
+"""
+
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+import requests
+
+import hyrule_metrics as metrics
+import zelda_functions as utl
+
+IMAGE_CACHE_DIRECTORY = './image_cache'
+IMAGE_FAILURE_TTL = 60  # seconds a failed download is remembered before it is retried
+DATASET_FILEPATH = 'hyrule_retrieved.json'
+
+
+class ImageCache:
+    """Downloads images on first use and keeps them on disk, keyed by content digest.
+    Downloads go through < zelda_functions.upstream_breaker >, and a URL whose download
+    failed is not requested again for < failure_ttl > seconds.
+
+    Parameters:
+        directory (str): root directory of the cache
+        timeout (float): timeout for each download in seconds
+        failure_ttl (float): seconds a failed download is remembered
+    """
+
+    def __init__(self, directory=IMAGE_CACHE_DIRECTORY, timeout=30, failure_ttl=IMAGE_FAILURE_TTL):
+        self.directory = directory
+        self.timeout = timeout
+        self.failure_ttl = failure_ttl
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        """Returns the cache record for < url >, downloading the image if it is not cached
+        and its last download did not fail within < failure_ttl > seconds.
+
+        Returns:
+            dict|None: record with 'url', 'digest', 'content_type', 'last_modified' (unix
+                       time) and 'path', or None if the image could not be downloaded
+        """
+
+        record = self.lookup(url)
+        if record is None and not self._recently_failed(url):
+            record = self.fetch(url)
+        return record
+
+    def lookup(self, url):
+        """Returns the cache record for < url > without any network access, or None."""
+
+        try:
+            with open(self._record_path(url), 'r', encoding='utf-8') as file:
+                record = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        record['path'] = self._object_path(record['digest'])
+        return record if os.path.exists(record['path']) else None
+
+    def fetch(self, url):
+        """Downloads < url > into the cache, replacing any previous record for it."""
+
+        breaker = utl.upstream_breaker
+        if not breaker.allow():
+            metrics.record_upstream('circuit_open', 0)
+            return None
+        start = time.perf_counter()
+        try:
+            response = utl.get_session().get(url, timeout=self.timeout)
+            if 400 <= response.status_code < 500 and response.status_code != 429:
+                breaker.record_success()
+                metrics.record_upstream('not_found', time.perf_counter() - start)
+                self._mark_failed(url)
+                return None
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            breaker.record_failure()
+            metrics.record_upstream('error', time.perf_counter() - start)
+            self._mark_failed(url)
+            print(f"Error downloading image: {e}")
+            return None
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+        metrics.record_upstream('ok', time.perf_counter() - start)
+        with self._lock:
+            self._failures.pop(url, None)
+
+        digest = hashlib.sha256(response.content).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            self._write_atomic(object_path, response.content)
+
+        last_modified = response.headers.get('Last-Modified')
+        record = {
+            'url': url,
+            'digest': digest,
+            'content_type': response.headers.get('Content-Type', 'application/octet-stream'),
+            'last_modified': _parse_http_date(last_modified) if last_modified else time.time(),
+        }
+        self._write_atomic(self._record_path(url), json.dumps(record).encode())
+        record['path'] = object_path
+        return record
+
+    def prefetch(self, urls, max_workers=16):
+        """Downloads every uncached URL in < urls > concurrently.
+
+        Parameters:
+            urls (iterable): image URLs
+            max_workers (int): maximum number of concurrent downloads
+
+        Returns:
+            tuple: (number of images now cached, number of failed downloads)
+        """
+
+        urls = [url for url in dict.fromkeys(urls) if url]
+        pending = [url for url in urls if self.lookup(url) is None]
+        cached = len(urls) - len(pending)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(self.fetch, pending))
+        failed = results.count(None)
+        return cached + len(results) - failed, failed
+
+    def _mark_failed(self, url):
+        with self._lock:
+            self._failures[url] = time.monotonic()
+
+    def _recently_failed(self, url):
+        with self._lock:
+            failed_at = self._failures.get(url)
+            if failed_at is None:
+                return False
+            if time.monotonic() - failed_at < self.failure_ttl:
+                return True
+            del self._failures[url]
+            return False
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], digest)
+
+    def _record_path(self, url):
+        return os.path.join(self.directory, 'urls', f"{hashlib.sha1(url.encode()).hexdigest()}.json")
+
+    @staticmethod
+    def _write_atomic(path, content):
+        # Each writer gets its own temporary file, so concurrent downloads of the same
+        # image never share one. Losing the race to an identical object is fine.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if not os.path.exists(path):
+                raise
+
+
+def _parse_http_date(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def main(dataset_filepath=DATASET_FILEPATH):
+    urls = [entry['image'] for entry in utl.read_json(dataset_filepath).values() if entry.get('image')]
+    start = time.perf_counter()
+    cached, failed = ImageCache().prefetch(urls)
+    print(f"{cached} of {len(set(urls))} images cached ({failed} failed) in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,56 @@
+"""Shared fixtures for the behavioural tests.
+
+The tests run from the repository root, like the project's scripts, and talk to
+StubCompendium (from 'benchmark.py') instead of the remote compendium API.
+"""
+
+import contextlib
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def in_repository(monkeypatch):
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture(scope='session')
+def entries():
+    from benchmark import DATASET_FILEPATH, load_entries
+
+    return load_entries(os.path.join(ROOT, DATASET_FILEPATH))
+
+
+@pytest.fixture
+def breaker():
+    """A fresh upstream circuit breaker, so failures of one test cannot open the circuit
+    for the next.
+    """
+
+    import zelda_functions as utl
+    from benchmark import use_breaker
+
+    with use_breaker(utl.CircuitBreaker()) as breaker:
+        yield breaker
+
+
+@pytest.fixture
+def compendium(breaker):
+    """Returns a function starting a StubCompendium (same arguments) and pointing the URL
+    constants of < zelda_functions > at it. A later call points them at the newer stub;
+    every stub is stopped when the test ends.
+    """
+
+    from benchmark import StubCompendium, use_endpoint
+
+    with contextlib.ExitStack() as stack:
+        def start(entries, **options):
+            stub = stack.enter_context(StubCompendium(entries, **options))
+            stack.enter_context(use_endpoint(stub.endpoint))
+            return stub
+
+        yield start
+
@@ -0,0 +1,39 @@
+"""AsyncCompendiumClient from the ASGI serving mode."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('numpy')
+pytest.importorskip('flask')
+pytest.importorskip('httpx')
+pytest.importorskip('quart')
+pytest.importorskip('asgiref')
+
+from asgi_app import AsyncCompendiumClient  # noqa: E402
+from benchmark import synthetic_entries  # noqa: E402
+from hyrule_cache import TieredCache  # noqa: E402
+
+
+def test_concurrent_lookups_are_coalesced(compendium, entries):
+    # Five concurrent lookups of each name, against a slow upstream: every name must be
+    # requested once, and later lookups must be answered by the cache.
+    distinct = 20
+    stub = compendium(entries + synthetic_entries(distinct), latency=0.1)
+    names = [f"synthetic item {i % distinct}" for i in range(5 * distinct)]
+    cache = TieredCache()
+
+    async def lookups():
+        client = AsyncCompendiumClient()
+        try:
+            found = await asyncio.gather(*(client.fetch_item_details(name, cache) for name in names))
+            found += await asyncio.gather(*(client.fetch_item_details(name, cache) for name in names))
+        finally:
+            await client.close()
+        return client, found
+
+    client, found = asyncio.run(lookups())
+    assert all(found)
+    assert stub.request_count == client.upstream_calls == distinct
+    assert client.coalesced >= len(names) - distinct
@@ -0,0 +1,133 @@
+"""Item stores, TieredCache and ImageCache."""
+
+import json
+import time
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('numpy')
+
+import zelda_functions as utl  # noqa: E402
+from benchmark import shared_cache_worker, wait_until  # noqa: E402
+from hyrule_cache import LogCache, TieredCache  # noqa: E402
+
+STORES = ('cache.jsonl', 'cache.sqlite')
+
+
+@pytest.mark.parametrize('filename', STORES)
+def test_expired_records_are_dropped(tmp_path, entries, filename):
+    ttl, size = 60, 200
+    now = time.time()
+    filepath = str(tmp_path / filename)
+    utl.create_cache(filepath).update(
+        {f"item {i}": {'fetched_at': now - (i % 2) * 2 * ttl, 'data': entries[0]} for i in range(size)})
+
+    cache = utl.create_cache(filepath, ttl=ttl)
+    cache.compact() if isinstance(cache, LogCache) else cache.purge()
+    reopened = utl.create_cache(filepath, ttl=ttl)
+    assert len(cache) == len(reopened) == size // 2
+    assert all(reopened[f"item {i}"]['data'] == entries[0] for i in range(0, size, 2))
+
+
+def test_legacy_cache_is_imported_once(tmp_path, entries):
+    legacy_filepath = str(tmp_path / 'cache.json')
+    with open(legacy_filepath, 'w') as file:
+        json.dump({'legacy item': entries[0]}, file)  # the whole-dict file written by save_cache
+
+    migrated = utl.create_cache(str(tmp_path / 'cache.sqlite'), ttl=60, legacy_filepath=legacy_filepath)
+    assert migrated['legacy item']['data'] == entries[0], 'legacy cache.json was not imported'
+    migrated['legacy item'] = {'fetched_at': time.time(), 'data': {}}
+    reopened = utl.create_cache(migrated.filepath, ttl=60, legacy_filepath=legacy_filepath)
+    assert reopened['legacy item']['data'] == {}, 'legacy cache.json was imported again'
+
+
+@pytest.mark.parametrize('filename', STORES)
+def test_cache_is_shared_between_processes(tmp_path, filename):
+    from multiprocessing import Pool
+
+    workers, writes = 3, 50
+    filepath = str(tmp_path / filename)
+    utl.create_cache(filepath)
+    with Pool(workers) as pool:
+        outcomes = pool.map(shared_cache_worker, [(filepath, worker, workers, writes) for worker in range(workers)])
+    assert all(visible == workers * writes for _, _, visible in outcomes), 'workers did not see each other\'s entries'
+    assert len(utl.create_cache(filepath)) == workers * writes
+
+
+def test_item_lookups_are_cached(compendium, entries, tmp_path):
+    stub = compendium(entries)
+    store_filepath = str(tmp_path / 'cache.jsonl')
+    names = [entry['name'] for entry in entries[:20]]
+    unknown = [f"unknown item {i}" for i in range(len(names))]
+
+    cache = TieredCache(LogCache(store_filepath), negative_ttl=60)
+    for _ in range(2):
+        assert all(utl.fetch_item_details(name, cache, store_filepath) for name in names)
+    assert all(utl.fetch_item_details(name, TieredCache(LogCache(store_filepath)), store_filepath)
+               for name in names), 'persisted items were not found'
+    for _ in range(2):
+        assert not any(utl.fetch_item_details(name, cache, store_filepath) for name in unknown)
+    assert stub.request_count == 2 * len(names), 'cached lookups reached the upstream API'
+
+
+def test_batch_lookup_fetches_each_name_once(compendium, entries, tmp_path):
+    stub = compendium(entries)
+    names = [entry['name'] for entry in entries[:20]]
+    filepath = str(tmp_path / 'batch.jsonl')
+    found = utl.fetch_items_details(names + names[:10], TieredCache(LogCache(filepath)), filepath)
+    assert all(found.values()) and len(found) == len(names)
+    assert set(LogCache(filepath)) == set(names)
+    assert stub.request_count == len(names)
+
+
+def test_stale_entries_are_served_then_refreshed(compendium, entries, tmp_path):
+    latency = 0.05
+    entries = entries[:20]
+    compendium(entries, latency=latency)
+    store = LogCache(str(tmp_path / 'cache.jsonl'))
+    store.update({entry['name']: {'fetched_at': time.time() - 120, 'data': {'name': entry['name'], 'stale': True}}
+                  for entry in entries})
+    cache = TieredCache(store, stale_after=60, refresh=lambda key: utl.fetch_item_from_api(key)[0])
+
+    start = time.perf_counter()
+    served = [cache.get(entry['name']) for entry in entries]
+    assert time.perf_counter() - start < latency, 'stale lookups waited for the upstream API'
+    assert all(value['stale'] for value in served), 'stale entries were not served from the cache'
+
+    assert wait_until(lambda: cache.stats()['refreshes'] == len(entries)), \
+        f"only {cache.stats()['refreshes']} of {len(entries)} entries were refreshed"
+    assert all('stale' not in cache.get(entry['name']) for entry in entries), 'refreshed entries were not served'
+    assert all('stale' not in LogCache(store.filepath)[entry['name']]['data'] for entry in entries), \
+        'refreshed entries were not persisted'
+
+
+def test_failed_refresh_is_counted_and_logged(capsys):
+    def failing_refresh(key):
+        raise RuntimeError(f"upstream exploded for {key}")
+
+    cache = TieredCache(stale_after=0, refresh=failing_refresh)
+    cache['item'] = {'name': 'item'}
+    assert cache.get('item') == {'name': 'item'}, 'stale entry was not served while its refresh failed'
+    assert wait_until(lambda: cache.stats()['refresh_failures'] == 1), 'failed refresh was not counted'
+    assert wait_until(lambda: 'upstream exploded' in capsys.readouterr().out), 'failed refresh was not logged'
+    assert cache.get('item') == {'name': 'item'}, 'failed refresh dropped the cached entry'
+
+
+def test_image_cache(compendium, entries, tmp_path):
+    from image_cache import ImageCache
+
+    entries = entries[:20]
+    stub = compendium(entries)
+    urls = [utl.HYRULE_IMAGE.format(entry['id']) for entry in entries]
+    image_cache = ImageCache(str(tmp_path / 'images'))
+    half = len(urls) // 2
+    assert all(image_cache.get(url) for url in urls[:half])
+    assert all(image_cache.get(url) for url in urls[:half])
+    assert stub.request_count == half, 'cached images were downloaded again'
+    assert image_cache.prefetch(url for url in urls + urls) == (len(urls), 0)
+
+    requests_before = stub.request_count
+    missing_url = utl.HYRULE_IMAGE.format('no such item')
+    assert image_cache.get(missing_url) is None and image_cache.get(missing_url) is None
+    assert stub.request_count == requests_before + 1, 'a failed download was retried immediately'
@@ -0,0 +1,67 @@
+"""Search, query and solver results compared with straightforward reference versions."""
+
+import random
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('numpy')
+
+import zelda_functions as utl  # noqa: E402
+from benchmark import (brute_force_dish, legacy_find_minimal_heart_combination, linear_query,  # noqa: E402
+                       scaled_entries)
+from hyrule_index import QueryIndex, SearchEngine  # noqa: E402
+
+
+@pytest.mark.parametrize('query, name', [('hylan', 'hylian shroom'), ('mastr', 'master sword'), ('lynle', 'lynel')])
+def test_search_finds_misspelled_names(entries, query, name):
+    assert any(result['name'] == name for result in SearchEngine(entries).search(query))
+
+
+@pytest.mark.parametrize('target', [10, 100, 300])
+def test_heart_solver_matches_legacy_solver(target):
+    items = list(utl.read_json('hearts_recovered_entries.json').values())
+    legacy = legacy_find_minimal_heart_combination(target, items)
+    combination = utl.find_minimal_heart_combination(target, items)
+    assert len(combination) == len(legacy)
+    assert sum(item['hearts_recovered'] for item in combination) == sum(item['hearts_recovered'] for item in legacy)
+
+
+def test_cooking_finds_optimal_dish(entries):
+    from hyrule_cooking import CookingIndex
+
+    rng = random.Random(0)
+    cooking_index = CookingIndex(entries)
+    effects = [None] + cooking_index.effects()
+    for _ in range(20):
+        effect = rng.choice(effects)
+        hearts_needed = rng.choice([None, rng.randint(1, 50) / 2, rng.randint(2, 50) / 2 - 0.001])
+        exact = hearts_needed is not None and rng.random() < 0.5
+        dishes = cooking_index.cook(hearts_needed, effect, exact, top_k=5)
+        found = None
+        if dishes:
+            size, total = len(dishes[0]['ingredients']), round(dishes[0]['hearts'] * utl.HEART_SCALE)
+            found = (size,) if exact else (-total, size)
+        assert found == brute_force_dish(cooking_index, hearts_needed, effect, exact), \
+            f"cook({hearts_needed}, {effect!r}, exact={exact}) is not optimal"
+
+
+def test_query_index_matches_linear_scan(entries):
+    rng = random.Random(0)
+    entries = scaled_entries(entries, 3)
+    index = QueryIndex(entries)
+    workload = [({'category': [category]}, {}) for category in index.values('category')]
+    workload += [({'location': [location]}, {'hearts': (0.5, 3)}) for location in rng.sample(index.values('location'), 5)]
+    workload += [({'cooking_effect': [effect], 'edible': ['true']}, {}) for effect in index.values('cooking_effect')]
+    workload += [({'edible': ['false']}, {'attack': (10, 30)}), ({}, {'hearts': (None, 1)})]
+    for filters, ranges in workload:
+        expected = linear_query(entries, filters, ranges)
+        page = index.query(filters, ranges, 0, 20)
+        assert page['total'] == len(expected) and page['results'] == expected[:20], f"{filters} {ranges}"
+
+
+def test_lookup_ignores_non_ascii_digits():
+    pytest.importorskip('flask')
+    import app as web
+
+    assert web.indexes.refresh().index.lookup('\u00b2') is None
@@ -0,0 +1,164 @@
+"""Crawling, syncing and protecting the upstream compendium API, against StubCompendium."""
+
+import time
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('numpy')
+
+import final_project  # noqa: E402
+import hyrule_metrics as metrics  # noqa: E402
+import hyrule_pipeline  # noqa: E402
+import zelda_functions as utl  # noqa: E402
+from benchmark import use_breaker  # noqa: E402
+from hyrule_index import normalize_key  # noqa: E402
+
+
+def test_crawlers_agree(compendium, entries):
+    compendium(entries, latency=0.001, serve_all=False)
+    serial = utl.fetch_data_until_invalid(1)
+    errors = metrics.UPSTREAM_REQUESTS.value(outcome='error')
+    concurrent = utl.fetch_data_concurrently(1, max_workers=16, use_all_endpoint=False)
+    assert list(concurrent) == list(serial)
+    assert len(serial) == len(entries)
+    assert metrics.UPSTREAM_REQUESTS.value(outcome='error') == errors, 'missing entries were recorded as errors'
+
+    compendium(entries)
+    assert list(utl.fetch_data_concurrently(1)) == list(serial), '/all endpoint returned different IDs'
+
+
+def test_crawler_retries_server_errors(compendium, entries):
+    compendium(entries, serve_all=False, error_rate=0.1)
+    data = utl.fetch_data_concurrently(1, max_workers=16, backoff=0.01, use_all_endpoint=False)
+    assert len(data) == len(entries), f"flaky upstream lost {len(entries) - len(data)} entries"
+
+
+def test_read_timeouts_are_not_retried(compendium, entries):
+    stub = compendium(entries[:1], latency=1.0)
+    assert utl.request_json(f"{utl.HYRULE_ENTRY}1", timeout=0.3)[1] == 'error'
+    assert stub.request_count == 1
+
+
+def test_tree_build_fetches_categories_concurrently(compendium, entries, tmp_path):
+    # With no local dataset every category is fetched from the API, so fetching them one
+    # at a time would take one round trip of < latency > per category.
+    latency = 0.2
+    compendium(entries, latency=latency)
+    start = time.perf_counter()
+    root_nodes = final_project.build_tree(str(tmp_path / 'missing_dataset.json'))
+    elapsed = time.perf_counter() - start
+    assert sum(len(node.children) for node in root_nodes.values()) == len(entries), 'tree is missing entries'
+    assert elapsed < 2 * latency, 'categories were not fetched concurrently'
+
+
+def test_sync_updates_derived_files(compendium, entries, tmp_path):
+    paths = {name: str(tmp_path / filename) for name, filename in (
+        ('dataset_filepath', 'hyrule_retrieved.json'), ('metadata_filepath', 'hyrule_sync.json'),
+        ('tree_filepath', 'hyrule_tree.json'), ('hearts_filepath', 'hearts.json'))}
+
+    def make_outputs():
+        return [hyrule_pipeline.NameIndex(str(tmp_path / 'names.json')),
+                hyrule_pipeline.CategoryStats(str(tmp_path / 'stats.json'))]
+
+    def sync(**options):
+        return final_project.sync_local_data(**paths, make_outputs=make_outputs, **options)
+
+    compendium(entries, serve_all=False)
+    assert len(sync()['added']) == len(entries), 'cold sync missed entries'
+    tree = final_project.build_tree(paths['dataset_filepath'])
+    utl.save_data_to_json({name: final_project.serialize_tree(node) for name, node in tree.items()},
+                          paths['tree_filepath'])
+
+    modified = [dict(entry) for entry in entries]
+    for entry in modified[:3]:
+        entry['name'] = f"{entry['name']} (renamed)"
+        entry['hearts_recovered'] = 7.0
+    compendium(modified, serve_all=False)
+    assert len(sync(max_age=0)['updated']) == 3, 'sync did not detect the changed entries'
+    hearts = utl.read_json(paths['hearts_filepath'])
+    tree_names = {child['name'] for node in utl.read_json(paths['tree_filepath']).values()
+                  for child in node['children']}
+    names = utl.read_json(str(tmp_path / 'names.json'))
+    stats = utl.read_json(str(tmp_path / 'stats.json'))
+    for entry in modified[:3]:
+        assert hearts[str(entry['id'])]['name'] == entry['name'], 'hearts index was not updated'
+        assert entry['name'] in tree_names, 'tree was not updated'
+        assert names.get(normalize_key(entry['name'])) == entry['id'], 'name index was not updated'
+        assert stats[entry['category']]['max_hearts'] >= 7.0, 'category stats were not updated'
+
+    compendium(modified)
+    sync()
+    changes = sync()
+    assert not changes['updated'] and not changes['added'], 'unchanged /all response produced changes'
+
+
+@pytest.fixture
+def no_retries():
+    utl.configure_session(retries=0)
+    yield
+    utl.configure_session()
+
+
+@pytest.fixture
+def failing_upstream(compendium, entries, no_retries):
+    """A stub answering every request with a 503, and the URL of an entry on it."""
+
+    stub = compendium(entries[:1], error_rate=1.0)
+    return stub, f"{utl.HYRULE_ENTRY}{entries[0]['name']}"
+
+
+class ExplodingSession:
+    def get(self, *args, **kwargs):
+        raise RuntimeError('unexpected error')
+
+
+def test_circuit_opens_and_fails_fast(failing_upstream):
+    stub, url = failing_upstream
+    with use_breaker(utl.CircuitBreaker(3, 60)) as breaker:
+        assert [utl.request_json(url)[1] for _ in range(3)] == ['error'] * 3
+        assert breaker.is_open and stub.request_count == 3, 'circuit did not open'
+        assert {utl.request_json(url)[1] for _ in range(10)} == {'error'}
+        assert stub.request_count == 3, 'open circuit reached the upstream API'
+
+
+def test_failed_trial_reopens_circuit(failing_upstream):
+    stub, url = failing_upstream
+    reset_timeout = 0.2
+    with use_breaker(utl.CircuitBreaker(1, reset_timeout)) as breaker:
+        utl.request_json(url)
+        time.sleep(reset_timeout)
+        assert utl.request_json(url)[1] == 'error' and stub.request_count == 2
+        assert breaker.is_open and utl.request_json(url)[1] == 'error', 'failed trial did not re-open the circuit'
+        assert stub.request_count == 2, 'second trial sent while the circuit was open'
+
+        time.sleep(reset_timeout)
+        stub.error_rate = 0.0
+        assert utl.request_json(url)[1] == 'ok'
+        assert not breaker.is_open, 'successful trial did not close the circuit'
+
+
+def test_trial_that_raises_releases_circuit(failing_upstream, monkeypatch):
+    stub, url = failing_upstream
+    reset_timeout = 0.2
+    with use_breaker(utl.CircuitBreaker(1, reset_timeout)) as breaker:
+        utl.request_json(url)
+        time.sleep(reset_timeout)
+        with monkeypatch.context() as patch:
+            patch.setattr(utl, '_shared_session', ExplodingSession())
+            with pytest.raises(RuntimeError):
+                utl.request_json(url)
+        stub.error_rate = 0.0
+        assert utl.request_json(url)[1] == 'ok', 'a trial that raised kept the circuit open'
+        assert not breaker.is_open
+
+
+def test_breaker_lets_one_trial_through():
+    reset_timeout = 0.2
+    breaker = utl.CircuitBreaker(1, reset_timeout)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(reset_timeout)
+    assert breaker.allow() and not breaker.allow(), 'more than one trial was let through'
+    time.sleep(reset_timeout)
+    assert breaker.allow(), 'a trial without an outcome kept the circuit open'
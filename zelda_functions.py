@@ -1,10 +1,24 @@
 import csv
+import hashlib
 import json
+import math
+import numpy as np
+import os
 import requests
-
+import threading
+import time
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from hyrule_cache import LogCache, SQLiteCache
+import hyrule_metrics as metrics
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import quote, urlencode, urljoin
 
-CACHE_FILEPATH = './cache.json'
+CACHE_FILEPATH = os.environ.get('HYRULE_CACHE', './cache.sqlite')  # e.g. './cache.jsonl' for the append-only log
+LEGACY_CACHE_FILEPATH = './cache.json'  # the item cache used before 'cache.sqlite', imported once by the app
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
 
 
 NONE_VALUES = ('', 'n/a', 'none', 'unknown')
@@ -14,27 +28,107 @@ HYRULE_ENTRY = f"{HYRULE_ENDPOINT}/entry/"
 HYRULE_ALL = f"{HYRULE_ENDPOINT}/all/"
 HYRULE_IMAGE = f"{HYRULE_ENDPOINT}/entry/{{}}/image"
 
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+SESSION_POOL_SIZE = 10
+SESSION_RETRIES = 3
+SESSION_BACKOFF = 0.5
+SESSION_READ_RETRIES = 0  # a hung upstream fails after one timeout instead of one per attempt
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30  # seconds
+SYNC_MAX_AGE = 7 * 24 * 60 * 60  # seconds before a synced entry is checked again
+
+HEART_SCALE = 100  # hearts_recovered values have at most two decimals
+UNREACHABLE = np.iinfo(np.int32).max // 2
+HEARTS_FILEPATH = 'hearts_recovered_entries.json'
+HEART_TABLE_CEILING = 1000  # largest number of hearts answered from the precomputed table
+HEART_TABLE_FILEPATH = None  # e.g. './heart_table.npz' to persist the table between runs
+MAX_HEARTS_NEEDED = HEART_TABLE_CEILING  # largest target accepted from users, so their queries stay in the shared table
+
 def save_data_to_json(data, filename):
-    with open(filename, 'w') as file:
-        json.dump(data, file, indent=4)
+    """Writes < data > to < filename > as indented JSON. The data is written to a temporary
+    file next to it, which then replaces < filename > atomically, so a reader (e.g.
+    < HeartTable.refresh > in a running app) never sees a partly written file. A file that
+    already exists keeps its line endings, so rewriting a tracked CRLF file (such as
+    'hyrule_tree.json') only changes the lines whose content changed.
+    """
 
-def create_cache(filepath):
+    try:
+        with open(filename, 'rb') as file:
+            newline = '\r\n' if b'\r\n' in file.read(4096) else '\n'
+    except FileNotFoundError:
+        newline = '\n'
+    tmp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_filename, 'w', newline=newline) as file:
+            json.dump(data, file, indent=4)
+        os.replace(tmp_filename, filename)
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+def create_cache(filepath, ttl=None, legacy_filepath=None):
     """Attempts to retrieve cache contents written to the file system. If successful the
     cache contents from the previous script run are returned to the caller as the new
     cache. If unsuccessful an empty cache is returned to the caller.
 
+    The cache is a < SQLiteCache > when < filepath > ends in one of < SQLITE_SUFFIXES > (as
+    the default < CACHE_FILEPATH > does), or an append-only < LogCache > otherwise: assigning
+    a key persists only that entry, so callers no longer need to rewrite the whole file with
+    < save_cache > after each miss. Both can be shared by several processes.
+
     Parameters:
         filepath (str): path to the cache file
+        ttl (float|None): seconds after which the store drops a < TieredCache > record
+        legacy_filepath (str|None): an older cache file (e.g. < LEGACY_CACHE_FILEPATH >)
+                                    imported with < import_legacy_cache > when < filepath >
+                                    does not exist yet
+
+    Returns:
+        LogCache|SQLiteCache: cache either empty or populated with resources from the previous script run
+    """
+
+    is_new = not os.path.exists(filepath)
+    if filepath.lower().endswith(SQLITE_SUFFIXES):
+        cache = SQLiteCache(filepath, ttl=ttl)
+    else:
+        cache = LogCache(filepath, ttl=ttl)
+    if is_new and legacy_filepath and os.path.exists(legacy_filepath) \
+            and os.path.abspath(legacy_filepath) != os.path.abspath(filepath):
+        count = import_legacy_cache(cache, legacy_filepath)
+        print(f"Imported {count} cached items from '{legacy_filepath}' into '{filepath}'.")
+    return cache
+
+
+def import_legacy_cache(store, legacy_filepath):
+    """Copies the entries of an older cache file into < store >. The file may hold one
+    JSON object (written by < save_cache >) or an append-only log (written by < LogCache >).
+    Entries saved without a timestamp are stamped with the file's modification time, so
+    < TieredCache > serves them until they are older than its TTL. The file is left in place.
+
+    Parameters:
+        store (dict-like): cache to copy the entries into, e.g. a < SQLiteCache >
+        legacy_filepath (str): path to the older cache file
 
     Returns:
-        dict: cache either empty or populated with resources from the previous script run
+        int: number of entries imported
     """
 
     try:
-        with open(filepath, 'r') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return {}
+        with open(legacy_filepath, 'r', encoding='utf-8') as file:
+            entries = json.load(file)
+    except ValueError:  # more than one line: an append-only log
+        entries = None
+    if not isinstance(entries, dict):
+        entries = dict(LogCache(legacy_filepath).items())
+
+    fetched_at = os.path.getmtime(legacy_filepath)
+    records = {}
+    for key, value in entries.items():
+        if value is not None:
+            is_record = isinstance(value, dict) and 'fetched_at' in value
+            records[key] = value if is_record else {'fetched_at': fetched_at, 'data': value}
+    store.update(records)
+    return len(records)
 
 
 
@@ -71,9 +165,89 @@ def convert_to_numeric(value):
     except ValueError:
         return value
 
-def request_data(url, params=None, timeout=30):
+class CircuitBreaker:
+    """Stops calling the upstream API after < failure_threshold > consecutive failures.
+    While open, requests fail immediately; after < reset_timeout > seconds a single trial
+    request is let through and its outcome closes or re-opens the circuit. A trial whose
+    outcome is never recorded is given up after another < reset_timeout > seconds, so one
+    lost request cannot keep the circuit open for good.
+
+    Parameters:
+        failure_threshold (int): consecutive failures that open the circuit
+        reset_timeout (float): seconds to wait before a trial request
     """
-    Makes a GET request to the specified URL with optional parameters and a timeout.
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow(self):
+        """Returns True if a request may be sent to the upstream API now."""
+
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if self._trial_in_flight and now - self._trial_started < self.reset_timeout:
+                return False
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self._trial_in_flight = True
+            self._trial_started = now
+            return True
+
+    def release(self):
+        """Gives up a trial request without recording an outcome, for requests that ended
+        before the upstream API could answer them (e.g. an invalid URL or an unexpected
+        exception). Does nothing while the circuit is closed.
+        """
+
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+upstream_breaker = CircuitBreaker()
+
+
+def json_object(response):
+    """Returns the decoded body of < response >, which the compendium API always sends as
+    a JSON object. Raises ValueError if the body is not JSON or not an object (e.g. a
+    list, a string or null), so callers handle it like any other malformed response.
+    """
+
+    payload = response.json()
+    if not isinstance(payload, dict):
+        raise ValueError(f"expected a JSON object, got {type(payload).__name__}")
+    return payload
+
+
+def request_json(url, params=None, timeout=30):
+    """Makes a GET request through the shared session and the < upstream_breaker >.
+    Unlike < request_data > it tells a missing resource apart from a failed request, and
+    only failed requests (connection errors, timeouts, 5xx responses) count against the
+    circuit breaker.
 
     Parameters:
         url (str): The URL to make the request to.
@@ -81,16 +255,179 @@ def request_data(url, params=None, timeout=30):
         timeout (int): Timeout for the request in seconds.
 
     Returns:
-        dict: The JSON response from the API converted into a Python dictionary.
+        tuple: (decoded JSON or None, status) where status is 'ok', 'not_found' or 'error'
     """
 
+    if not upstream_breaker.allow():
+        print(f"Upstream unavailable, skipping request: {url}")
+        metrics.record_upstream('circuit_open', 0)
+        return None, 'error'
+    start = time.perf_counter()
     try:
-        response = requests.get(url, params=params, timeout=timeout)
+        response = get_session().get(url, params=params, timeout=timeout)
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            upstream_breaker.record_success()
+            metrics.record_upstream('not_found', time.perf_counter() - start)
+            print(f"Error during request: {response.status_code} for url: {url}")
+            return None, 'not_found'
         response.raise_for_status()  # This will raise an HTTPError for bad responses
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        payload = json_object(response)
+    except requests.exceptions.InvalidURL as e:
+        upstream_breaker.release()
+        metrics.record_upstream('not_found', time.perf_counter() - start)
         print(f"Error during request: {e}")
-        return None
+        return None, 'not_found'
+    except (requests.exceptions.RequestException, ValueError) as e:
+        upstream_breaker.record_failure()
+        metrics.record_upstream('error', time.perf_counter() - start)
+        print(f"Error during request: {e}")
+        return None, 'error'
+    except BaseException:
+        upstream_breaker.release()
+        raise
+    upstream_breaker.record_success()
+    metrics.record_upstream('ok', time.perf_counter() - start)
+    return payload, 'ok'
+
+
+def request_conditional(url, validators=None, timeout=30):
+    """Conditional counterpart of < request_json >. The 'etag' and 'last_modified' values
+    in < validators > (as returned by a previous call) are sent as If-None-Match and
+    If-Modified-Since, so an unchanged resource costs a 304 response without a body.
+
+    Parameters:
+        url (str): The URL to make the request to.
+        validators (dict): validators of the copy held by the caller, or None
+        timeout (int): Timeout for the request in seconds.
+
+    Returns:
+        tuple: (decoded JSON or None, status, validators) where status is 'ok',
+               'not_modified', 'not_found' or 'error'
+    """
+
+    validators = validators or {}
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+
+    if not upstream_breaker.allow():
+        metrics.record_upstream('circuit_open', 0)
+        return None, 'error', validators
+    start = time.perf_counter()
+    try:
+        response = get_session().get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            upstream_breaker.record_success()
+            metrics.record_upstream('not_modified', time.perf_counter() - start)
+            return None, 'not_modified', validators
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            upstream_breaker.record_success()
+            metrics.record_upstream('not_found', time.perf_counter() - start)
+            return None, 'not_found', {}
+        response.raise_for_status()
+        payload = json_object(response)
+    except requests.exceptions.InvalidURL as e:
+        upstream_breaker.release()
+        metrics.record_upstream('not_found', time.perf_counter() - start)
+        print(f"Error during request: {e}")
+        return None, 'not_found', {}
+    except (requests.exceptions.RequestException, ValueError) as e:
+        upstream_breaker.record_failure()
+        metrics.record_upstream('error', time.perf_counter() - start)
+        print(f"Error during request: {e}")
+        return None, 'error', validators
+    except BaseException:
+        upstream_breaker.release()
+        raise
+    upstream_breaker.record_success()
+    metrics.record_upstream('ok', time.perf_counter() - start)
+    return payload, 'ok', {'etag': response.headers.get('ETag'),
+                           'last_modified': response.headers.get('Last-Modified')}
+
+
+def request_data(url, params=None, timeout=30):
+    """
+    Makes a GET request to the specified URL with optional parameters and a timeout.
+
+    Parameters:
+        url (str): The URL to make the request to.
+        params (dict): Optional dictionary of query string parameters.
+        timeout (int): Timeout for the request in seconds.
+
+    Returns:
+        dict: The JSON response from the API converted into a Python dictionary.
+    """
+
+    return request_json(url, params=params, timeout=timeout)[0]
+
+def create_session(pool_size=10, retries=3, backoff=0.5, read_retries=None):
+    """Returns a < requests.Session > that keeps connections alive in a pool of
+    < pool_size > connections per host and retries failed requests. Connection errors and
+    the status codes in < RETRY_STATUS_CODES > are retried up to < retries > times, waiting
+    backoff * 2 ** (attempt - 1) seconds between attempts. Read errors, such as read
+    timeouts, are retried up to < read_retries > times, which each wait a full timeout.
+
+    Parameters:
+        pool_size (int): maximum number of pooled connections kept per host
+        retries (int): maximum number of retries for a single request
+        backoff (float): backoff factor in seconds used between retries
+        read_retries (int|None): maximum number of retries after a read error, or None
+                                 to allow up to < retries >
+
+    Returns:
+        requests.Session: session configured with pooling and retries
+    """
+
+    retry = Retry(total=retries, read=read_retries, backoff_factor=backoff, status_forcelist=RETRY_STATUS_CODES,
+                  allowed_methods=('GET',), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returns the process-wide session used by < request_data > and < get_resource >, so
+    that requests reuse pooled keep-alive connections instead of opening a new connection
+    each time. The session is created on first use from < SESSION_POOL_SIZE >,
+    < SESSION_RETRIES >, < SESSION_BACKOFF > and < SESSION_READ_RETRIES >: interactive
+    lookups do not retry read timeouts, so a hung upstream costs one timeout per request.
+
+    Returns:
+        requests.Session: the shared session
+    """
+
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = create_session(SESSION_POOL_SIZE, SESSION_RETRIES, SESSION_BACKOFF,
+                                                 SESSION_READ_RETRIES)
+    return _shared_session
+
+
+def configure_session(pool_size=SESSION_POOL_SIZE, retries=SESSION_RETRIES, backoff=SESSION_BACKOFF,
+                      read_retries=SESSION_READ_RETRIES):
+    """Replaces the shared session with one using the given pool size and retry policy.
+
+    Parameters:
+        pool_size (int): maximum number of pooled connections kept per host
+        retries (int): maximum number of retries for a single request
+        backoff (float): backoff factor in seconds used between retries
+        read_retries (int|None): maximum number of retries after a read error
+    """
+
+    global _shared_session
+    with _shared_session_lock:
+        previous, _shared_session = _shared_session, create_session(pool_size, retries, backoff, read_retries)
+    if previous is not None:
+        previous.close()
 
 def get_nested_dict(data, key, filter):
     """Attempts to retrieve a nested dictionary in < data > using the passed in < filter >
@@ -131,9 +468,9 @@ def get_resource(url, params=None, timeout=10):
     """
 
     if params:
-        return requests.get(url, params, timeout=timeout).json()
+        return get_session().get(url, params=params, timeout=timeout).json()
     else:
-        return requests.get(url, timeout=timeout).json()
+        return get_session().get(url, timeout=timeout).json()
 
 
 def read_csv_to_dicts(filepath, encoding='utf-8', newline='', delimiter=','):
@@ -199,62 +536,219 @@ def fetch_data_until_invalid(start_id, max_invalid=10):
     return all_data
 
 
+def fetch_entry(session, entry_id, timeout=30):
+    """Retrieves a single compendium entry by ID using the passed in < session >. Retries
+    are handled by the session (see < create_session >).
+
+    Parameters:
+        session (requests.Session): session used to make the request
+        entry_id (int): ID of the entry
+        timeout (int): timeout for the request in seconds
+
+    Returns:
+        tuple: (the entry's data or None, status) where status is 'ok', 'not_found' or
+               'error', as returned by < request_json >
+    """
+
+    start = time.perf_counter()
+    try:
+        response = session.get(f"{HYRULE_ENTRY}{entry_id}", timeout=timeout)
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            metrics.record_upstream('not_found', time.perf_counter() - start)
+            return None, 'not_found'
+        response.raise_for_status()
+        data = json_object(response).get('data') or None
+    except (requests.exceptions.RequestException, ValueError):
+        metrics.record_upstream('error', time.perf_counter() - start)
+        return None, 'error'
+    status = 'ok' if data else 'not_found'
+    metrics.record_upstream(status, time.perf_counter() - start)
+    return data, status
+
+
+def fetch_data_concurrently(start_id, max_invalid=10, max_workers=8, retries=3, backoff=0.5,
+                            timeout=30, use_all_endpoint=True):
+    """Bulk counterpart of < fetch_data_until_invalid >. Tries the < HYRULE_ALL > endpoint
+    first and, if it is unreachable, falls back to fetching entries one ID at a time with
+    up to < max_workers > requests in flight over a pooled session. IDs are requested in
+    batches and the crawl stops after < max_invalid > consecutive missing IDs, exactly like
+    the serial loop. IDs whose requests still fail after the session's retries are
+    requested again, up to < retries > more times, so an upstream error never passes for a
+    missing entry; if some still fail, requests.exceptions.RetryError is raised instead
+    of returning an incomplete dataset.
+
+    Parameters:
+        start_id (int): first entry ID to fetch
+        max_invalid (int): number of consecutive missing IDs that ends the crawl
+        max_workers (int): maximum number of concurrent requests
+        retries (int): retries per request for connection errors and 429/5xx responses
+        backoff (float): backoff factor in seconds used between retries
+        timeout (int): timeout for each request in seconds
+        use_all_endpoint (bool): whether to try the < HYRULE_ALL > endpoint first
+
+    Returns:
+        dict: entries keyed by their integer ID in ascending order
+    """
+
+    session = create_session(pool_size=max_workers, retries=retries, backoff=backoff)
+    with session:
+        if use_all_endpoint:
+            all_data = fetch_all_entries(session, timeout=timeout)
+            if all_data:
+                return {entry_id: entry for entry_id, entry in all_data.items() if entry_id >= start_id}
+
+        all_data = {}
+        consecutive_invalid = 0
+        batch_size = max(max_workers, max_invalid)
+        current_id = start_id
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while consecutive_invalid < max_invalid:
+                batch = range(current_id, current_id + batch_size)
+                results = dict(zip(batch, executor.map(lambda entry_id: fetch_entry(session, entry_id, timeout), batch)))
+                for attempt in range(retries):
+                    failed = [entry_id for entry_id, (_, status) in results.items() if status == 'error']
+                    if not failed:
+                        break
+                    time.sleep(backoff * 2 ** attempt)
+                    results.update(zip(failed, executor.map(lambda entry_id: fetch_entry(session, entry_id, timeout),
+                                                            failed)))
+                failed = [entry_id for entry_id, (_, status) in results.items() if status == 'error']
+                if failed:
+                    raise requests.exceptions.RetryError(f"Could not fetch entries {failed} from {HYRULE_ENTRY}")
+                for entry_id in batch:
+                    data, _ = results[entry_id]
+                    if data:
+                        all_data[entry_id] = data
+                        consecutive_invalid = 0
+                    else:
+                        consecutive_invalid += 1
+                        if consecutive_invalid >= max_invalid:
+                            break
+                current_id += batch_size
+
+    return all_data
+
+
+def normalize_item_data(item_data):
+    """Converts the numeric fields of an API entry (hearts, fuse attack power, attack and
+    defense) from strings to numbers in place and returns the entry.
+    """
+
+    if item_data['category'] == 'materials':
+        # Convert 'hearts_recovered' to numeric if present
+        if 'hearts_recovered' in item_data and item_data['hearts_recovered'] is not None:
+            item_data['hearts_recovered'] = convert_to_numeric(item_data['hearts_recovered'])
+
+        # Convert 'fuse_attack_power' to numeric only if present
+        if 'fuse_attack_power' in item_data and item_data['fuse_attack_power'] is not None:
+            item_data['fuse_attack_power'] = convert_to_numeric(item_data['fuse_attack_power'])
+
+    elif item_data['category'] == 'equipment':
+        properties = item_data.get('properties', {})
+        properties['attack'] = convert_to_numeric(properties.get('attack', 0))
+        properties['defense'] = convert_to_numeric(properties.get('defense', 0))
+        item_data['properties'] = properties
+
+    elif item_data['category'] == 'creatures':
+        item_data['hearts_recovered'] = convert_to_numeric(item_data.get('hearts_recovered', 0))
+
+    return item_data
+
+
+def fetch_item_from_api(item_name, timeout=30):
+    """Fetches and normalizes a single entry from the API, bypassing any cache.
+
+    Returns:
+        tuple: (entry or None, status) where status is 'ok', 'not_found' or 'error'
+    """
+
+    response, status = request_json(f"{HYRULE_ENTRY}{item_name}", timeout=timeout)
+    if status == 'ok' and not (response and response.get('data')):
+        return None, 'not_found'
+    if status != 'ok':
+        return None, status
+    return normalize_item_data(response['data']), status
+
+
 def fetch_item_details(item_name, cache, cache_filepath):
-    if item_name in cache:
-        return cache[item_name]
-
-    url = f"{HYRULE_ENTRY}{item_name}"
-    response = request_data(url)
-    if response and 'data' in response:
-        item_data = response['data']
-
-        if item_data['category'] == 'materials':
-            # Convert 'hearts_recovered' to numeric if present
-            if 'hearts_recovered' in item_data and item_data['hearts_recovered'] is not None:
-                item_data['hearts_recovered'] = convert_to_numeric(item_data['hearts_recovered'])
-
-            # Convert 'fuse_attack_power' to numeric only if present
-            if 'fuse_attack_power' in item_data and item_data['fuse_attack_power'] is not None:
-                item_data['fuse_attack_power'] = convert_to_numeric(item_data['fuse_attack_power'])
-
-        elif item_data['category'] == 'equipment':
-            properties = item_data.get('properties', {})
-            properties['attack'] = convert_to_numeric(properties.get('attack', 0))
-            properties['defense'] = convert_to_numeric(properties.get('defense', 0))
-            item_data['properties'] = properties
-
-        elif item_data['category'] == 'creatures':
-            item_data['hearts_recovered'] = convert_to_numeric(item_data.get('hearts_recovered', 0))
-
-        cache[item_name] = response['data']
-        save_cache(cache_filepath, cache)
-        return response['data']
+    cached = cache.get(item_name)
+    if cached is not None:
+        metrics.ITEM_LOOKUPS.inc(source='cache')
+        return cached
+    if hasattr(cache, 'is_missing') and cache.is_missing(item_name):
+        metrics.ITEM_LOOKUPS.inc(source='negative_cache')
+        return None
+
+    item_data, status = fetch_item_from_api(item_name)
+    metrics.ITEM_LOOKUPS.inc(source=f"upstream_{status}")
+    if item_data:
+        cache[item_name] = item_data
+        if isinstance(cache, dict):
+            save_cache(cache_filepath, cache)
+        return item_data
+    if status == 'not_found' and hasattr(cache, 'mark_missing'):
+        cache.mark_missing(item_name)
     return None
 
-def find_minimal_heart_recovery(hearts_needed, materials_data):
-    materials = [(mat['name'], mat['hearts_recovered']) for mat in materials_data]
 
-    dp = [float('inf')] * (hearts_needed + 1)
-    dp[0] = 0
+def fetch_items_details(item_names, cache, cache_filepath, max_workers=8):
+    """Batch counterpart of < fetch_item_details >. Duplicate names are looked up once,
+    cached entries are served from < cache >, the remaining names are fetched with up to
+    < max_workers > concurrent requests, and the new entries are persisted in a single
+    write for the whole batch.
+
+    Parameters:
+        item_names (iterable): entry names or IDs
+        cache (dict-like): cache mapping names to entries, e.g. a < hyrule_cache.TieredCache >
+        cache_filepath (str): file the cache is saved to when < cache > is a plain dict
+        max_workers (int): maximum number of concurrent requests
 
-    combination = [None] * (hearts_needed + 1)
+    Returns:
+        dict: every distinct name mapped to its entry, or None if it was not found
+    """
 
-    for i in range(1, hearts_needed + 1):
-        for material, hearts in materials:
-            if hearts <= i and dp[i - hearts] + 1 < dp[i]:
-                dp[i] = dp[i - hearts] + 1
-                combination[i] = material
+    results = {}
+    misses = []
+    for item_name in dict.fromkeys(item_names):
+        cached = cache.get(item_name)
+        if cached is not None:
+            metrics.ITEM_LOOKUPS.inc(source='cache')
+            results[item_name] = cached
+        elif hasattr(cache, 'is_missing') and cache.is_missing(item_name):
+            metrics.ITEM_LOOKUPS.inc(source='negative_cache')
+            results[item_name] = None
+        else:
+            misses.append(item_name)
+    if not misses:
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(misses))) as executor:
+        fetched = list(executor.map(fetch_item_from_api, misses))
+
+    found = {}
+    for item_name, (item_data, status) in zip(misses, fetched):
+        metrics.ITEM_LOOKUPS.inc(source=f"upstream_{status}")
+        results[item_name] = item_data
+        if item_data:
+            found[item_name] = item_data
+        elif status == 'not_found' and hasattr(cache, 'mark_missing'):
+            cache.mark_missing(item_name)
+    if found:
+        cache.update(found)
+        if isinstance(cache, dict):
+            save_cache(cache_filepath, cache)
+    return results
 
-    if dp[hearts_needed] == float('inf'):
-        return "No combination found"
 
-    result_combination = []
-    while hearts_needed > 0:
-        material = combination[hearts_needed]
-        result_combination.append(material)
-        hearts_needed -= next(mat[1] for mat in materials if mat[0] == material)
+def find_minimal_heart_recovery(hearts_needed, materials_data):
+    """Returns the names of the fewest materials whose hearts add up to exactly
+    < hearts_needed >, joined by ', ', or "No combination found".
+    """
 
-    return ', '.join(result_combination)
+    combo = find_minimal_heart_combination(hearts_needed, materials_data, exact=True)
+    if not combo:
+        return "No combination found"
+    return ', '.join(item['name'] for item in combo)
 
 def fetch_data_by_category(category):
     """
@@ -270,51 +764,567 @@ def fetch_data_by_category(category):
         print(f"Error fetching data from API: {e}")
         return None
 
-def fetch_all_entries():
-    api_url = "https://your-api-endpoint.com/all_entries"
+def fetch_all_entries(session=None, timeout=30):
+    """Retrieves every compendium entry with a single request to < HYRULE_ALL >.
+
+    Parameters:
+        session (requests.Session): optional session used to make the request
+        timeout (int): timeout for the request in seconds
+
+    Returns:
+        dict|None: entries keyed by their integer ID in ascending order, or None if the
+                   endpoint could not be reached or returned no data
+    """
+
+    start = time.perf_counter()
     try:
-        response = requests.get(api_url)
+        response = (session or requests).get(HYRULE_ALL, timeout=timeout)
         response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        entries = json_object(response).get('data')
+    except (requests.exceptions.RequestException, ValueError) as e:
+        metrics.record_upstream('error', time.perf_counter() - start)
         print(f"Error fetching data: {e}")
         return None
+    metrics.record_upstream('ok', time.perf_counter() - start)
+
+    if not entries or not isinstance(entries, list):
+        return None
+    return {entry['id']: entry for entry in sorted(entries, key=lambda entry: entry['id'])}
 
 
-def find_minimal_heart_combination(hearts_needed, items):
-    items.sort(key=lambda x: x['hearts_recovered'])
+def entry_digest(entry):
+    """Returns a digest of < entry >'s content that does not depend on key order."""
 
-    best_combinations = [None] * (int(hearts_needed * 10) + 1)
-    best_combinations[0] = []
+    return hashlib.sha1(json.dumps(entry, sort_keys=True).encode()).hexdigest()
 
-    for heart_value in range(len(best_combinations)):
-        for item in items:
-            if item['hearts_recovered'] * 10 <= heart_value:
-                prev_value = heart_value - int(item['hearts_recovered'] * 10)
-                if best_combinations[prev_value] is not None:
-                    if best_combinations[heart_value] is None or len(best_combinations[prev_value]) + 1 < len(best_combinations[heart_value]):
-                        best_combinations[heart_value] = best_combinations[prev_value] + [item]
 
-    for heart_value in range(int(hearts_needed * 10), -1, -1):
-        if best_combinations[heart_value] is not None:
-            return best_combinations[heart_value]
+def sync_entries(dataset, metadata, max_age=SYNC_MAX_AGE, max_workers=8, max_invalid=10, timeout=30,
+                 use_all_endpoint=True):
+    """Brings < dataset > up to date with the API in place, fetching as little as possible.
+
+    With < use_all_endpoint > the < HYRULE_ALL > endpoint is requested conditionally, so an
+    unchanged compendium costs a single 304 response. Otherwise only entries whose last
+    check is older than < max_age > seconds (or that were never checked) are requested,
+    each conditionally, and IDs after the highest known one are probed for new entries
+    until < max_invalid > consecutive IDs are missing. Fetched entries replace the local
+    copy only if their content changed.
+
+    < metadata > holds the per-entry 'fetched_at' time, content digest and HTTP validators
+    between runs, and is updated in place.
+
+    Parameters:
+        dataset (dict): entries keyed by ID string, like 'hyrule_retrieved.json'
+        metadata (dict): sync metadata from the previous run, or an empty dict
+        max_age (float): seconds before an entry is checked again
+        max_workers (int): maximum number of concurrent requests
+        max_invalid (int): number of consecutive missing IDs that ends the probe for new entries
+        timeout (int): timeout for each request in seconds
+        use_all_endpoint (bool): whether to try the < HYRULE_ALL > endpoint first
+
+    Returns:
+        dict: IDs 'added', 'updated' and 'removed', the 'previous' version of updated and
+              removed entries, and the number of entries 'unchanged' and 'checked'
+    """
+
+    records = metadata.setdefault('entries', {})
+    now = time.time()
+    fetched = {}
+    validators = {}
+    checked = set()
+    removed = set()
+
+    bulk = None
+    if use_all_endpoint:
+        payload, status, bulk_validators = request_conditional(HYRULE_ALL, metadata.get('all'), timeout)
+        if status == 'not_modified':
+            bulk = {}
+            checked.update(dataset)
+        elif status == 'ok' and payload and payload.get('data'):
+            bulk = {str(entry['id']): entry for entry in payload['data']}
+            checked.update(dataset)
+            removed.update(set(dataset) - set(bulk))
+        if bulk is not None:
+            metadata['all'] = dict(bulk_validators, fetched_at=now)
+            fetched = bulk
+
+    if bulk is None:
+        stale = [key for key in dataset if now - records.get(key, {}).get('fetched_at', 0) >= max_age]
+
+        def check(key):
+            return key, request_conditional(f"{HYRULE_ENTRY}{key}", records.get(key), timeout)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for key, (payload, status, entry_validators) in executor.map(check, stale):
+                if status == 'error':
+                    continue
+                checked.add(key)
+                if status == 'not_found':
+                    removed.add(key)
+                elif status == 'ok' and payload and payload.get('data'):
+                    fetched[key] = payload['data']
+                    validators[key] = entry_validators
+
+            consecutive_invalid = 0
+            current_id = max((int(key) for key in dataset), default=0) + 1
+            batch_size = max(max_workers, max_invalid)
+            while consecutive_invalid < max_invalid:
+                batch = [str(entry_id) for entry_id in range(current_id, current_id + batch_size)]
+                for key, (payload, status, entry_validators) in executor.map(check, batch):
+                    if status == 'ok' and payload and payload.get('data'):
+                        fetched[key] = payload['data']
+                        validators[key] = entry_validators
+                        consecutive_invalid = 0
+                    else:
+                        consecutive_invalid += 1
+                        if consecutive_invalid >= max_invalid:
+                            break
+                current_id += batch_size
+
+    changes = {'added': [], 'updated': [], 'removed': [], 'previous': {}, 'unchanged': 0,
+               'checked': len(checked | set(fetched))}
+    for key in checked | set(fetched):
+        if key in removed:
+            continue
+        record = records.setdefault(key, {})
+        record['fetched_at'] = now
+        if key in validators:
+            record.update(validators[key])
+        if key not in fetched:
+            changes['unchanged'] += 1
+            continue
+        digest = entry_digest(fetched[key])
+        if key in dataset and entry_digest(dataset[key]) == digest:
+            changes['unchanged'] += 1
+        else:
+            changes['updated' if key in dataset else 'added'].append(key)
+            if key in dataset:
+                changes['previous'][key] = dataset[key]
+            dataset[key] = fetched[key]
+        record['digest'] = digest
+
+    for key in removed & set(dataset):
+        changes['removed'].append(key)
+        changes['previous'][key] = dataset.pop(key)
+        records.pop(key, None)
+    for name in ('added', 'updated', 'removed'):
+        changes[name].sort(key=int)
+    return changes
+
+
+def dedupe_by_hearts(items):
+    """Returns one item per distinct positive < hearts_recovered > value, keeping the first
+    item seen for each value, sorted by hearts. Items recovering no hearts are dropped
+    since they can never help reach a target.
+
+    Parameters:
+        items (list): item dictionaries with a < hearts_recovered > value
+
+    Returns:
+        list: deduplicated items in ascending order of hearts recovered
+    """
+
+    unique = {}
+    for item in items:
+        hearts = item.get('hearts_recovered')
+        if hearts and hearts > 0:
+            unique.setdefault(hearts, item)
+    return sorted(unique.values(), key=lambda item: item['hearts_recovered'])
+
+
+def scale_hearts(items, hearts_needed):
+    """Converts heart values to small integers. Hearts are scaled by < HEART_SCALE > and
+    divided by the greatest common divisor of the item values, so the usual half-heart
+    steps need only two DP cells per heart.
+
+    Returns:
+        tuple: (integer item values, integer target rounded down, divisor applied to the
+               scaled values)
+    """
+
+    units = [int(round(item['hearts_recovered'] * HEART_SCALE)) for item in items]
+    divisor = math.gcd(*units) if units else 1
+    return [unit // divisor for unit in units], scale_target(hearts_needed, divisor), divisor
+
+
+def check_hearts_needed(hearts_needed):
+    """Raises ValueError with a user-facing message unless < hearts_needed > is a finite
+    number of at most < MAX_HEARTS_NEEDED > hearts. The solvers allocate tables as large
+    as the target, so user input is checked before solving.
+    """
+
+    if not math.isfinite(hearts_needed):
+        raise ValueError("Please enter a finite number of hearts.")
+    if hearts_needed > MAX_HEARTS_NEEDED:
+        raise ValueError(f"Please enter at most {MAX_HEARTS_NEEDED} hearts.")
+
+
+def scale_target(hearts_needed, divisor):
+    return int(math.floor(hearts_needed * HEART_SCALE + 1e-9)) // divisor
+
+
+def is_scaled_exactly(hearts_needed, target, divisor):
+    return math.isclose(target * divisor / HEART_SCALE, hearts_needed)
+
+
+def solve_heart_table(values, target):
+    """Unbounded minimum-count DP over the integer item < values > for every total from 0
+    to < target >, using O(target) memory. Each item is relaxed with NumPy over the whole
+    table at shifts of 1, 2, 4, ... copies, which covers every copy count in
+    O(log(target / value)) vectorized passes. Instead of storing combinations, each cell
+    keeps a back-pointer to the item and shift that last improved it.
+
+    Parameters:
+        values (list): positive integer item values
+        target (int): largest total to solve
+
+    Returns:
+        tuple: (counts, back_item, back_step) arrays of length target + 1, where counts[v]
+               is the fewest items totalling v (or < UNREACHABLE >)
+    """
+
+    counts = np.full(target + 1, UNREACHABLE, dtype=np.int32)
+    counts[0] = 0
+    back_item = np.full(target + 1, -1, dtype=np.int32)
+    back_step = np.zeros(target + 1, dtype=np.int32)
+
+    for index, value in enumerate(values):
+        step, copies = value, 1
+        while step <= target:
+            candidate = counts[:-step] + copies
+            improved = np.flatnonzero(candidate < counts[step:])
+            if improved.size:
+                counts[improved + step] = candidate[improved]
+                back_item[improved + step] = index
+                back_step[improved + step] = step
+            step, copies = step * 2, copies * 2
+    return counts, back_item, back_step
+
+
+def reconstruct_heart_combination(items, values, back_item, back_step, total):
+    """Follows the back-pointers from < total > down to 0 and returns the items used."""
+
+    combo = []
+    while total > 0:
+        index = int(back_item[total])
+        step = int(back_step[total])
+        combo.extend([items[index]] * (step // values[index]))
+        total -= step
+    return combo
+
+
+def find_minimal_heart_combination(hearts_needed, items, exact=False):
+    """Returns the fewest items (each usable any number of times) recovering the most
+    hearts not exceeding < hearts_needed >, or exactly < hearts_needed > if < exact >.
+    Items are deduplicated by heart value and the caller's list is left untouched.
+
+    Parameters:
+        hearts_needed (float): number of hearts to recover
+        items (list): item dictionaries with 'name' and 'hearts_recovered'
+        exact (bool): whether only combinations totalling exactly < hearts_needed > count
+
+    Returns:
+        list|None: the items in the combination (an empty list if no positive total is
+                   reachable), or None if there is no valid combination
+    """
+
+    if hearts_needed < 0:
+        return None
+    unique_items = dedupe_by_hearts(items)
+    values, target, divisor = scale_hearts(unique_items, hearts_needed)
+    if exact and not is_scaled_exactly(hearts_needed, target, divisor):
+        return None
+
+    counts, back_item, back_step = solve_heart_table(values, target)
+    if exact:
+        total = target if counts[target] < UNREACHABLE else None
+    else:
+        total = int(np.flatnonzero(counts < UNREACHABLE)[-1])
+    if total is None:
+        return None
+    return reconstruct_heart_combination(unique_items, values, back_item, back_step, total)
+
+def copy_pieces(limit, value, target):
+    """Splits up to < limit > copies (None for unlimited) of an item worth < value > into
+    pieces of 1, 2, 4, ... copies plus a remainder. Taking each piece at most once can
+    express every copy count from 0 to the limit, which turns a bounded (or unbounded)
+    item into O(log) 0/1 items.
+    """
+
+    remaining = target // value if limit is None else min(limit, target // value)
+    copies = 1
+    while remaining > 0:
+        piece = min(copies, remaining)
+        yield piece
+        remaining -= piece
+        copies *= 2
+
+
+def solve_prefix_tables(values, limits, target):
+    """Builds the fewest- and most-items tables for every prefix of the item groups.
+    Row i of each table describes totals reachable with the first i groups only, which
+    gives the exact lower and upper item-count bounds used to prune the enumeration in
+    < find_heart_combinations >.
+
+    Parameters:
+        values (list): positive integer value of each group
+        limits (list): maximum copies of each group, or None for unlimited
+        target (int): largest total to solve
+
+    Returns:
+        tuple: (min_counts, max_counts) arrays of shape (len(values) + 1, target + 1);
+               unreachable cells hold < UNREACHABLE > and -1 respectively
+    """
+
+    min_counts = np.full((len(values) + 1, target + 1), UNREACHABLE, dtype=np.int32)
+    max_counts = np.full((len(values) + 1, target + 1), -1, dtype=np.int32)
+    min_counts[0, 0] = max_counts[0, 0] = 0
+    for i, (value, limit) in enumerate(zip(values, limits)):
+        fewest, most = min_counts[i].copy(), max_counts[i].copy()
+        for copies in copy_pieces(limit, value, target):
+            step = copies * value
+            np.minimum(fewest[step:], fewest[:-step] + copies, out=fewest[step:])
+            reachable = most[:-step] >= 0
+            np.maximum(most[step:], np.where(reachable, most[:-step] + copies, -1), out=most[step:])
+        min_counts[i + 1], max_counts[i + 1] = fewest, most
+    return min_counts, max_counts
+
+
+def group_heart_items(items, inventory=None, exclude=()):
+    """Groups the usable items by heart value. Excluded names are dropped and each group's
+    copy limit is the sum of its items' < inventory > counts (unlimited if any of its
+    items has no inventory entry).
+
+    Returns:
+        list: (hearts, items, copy limit) tuples in ascending order of hearts
+    """
+
+    inventory = {name.lower(): count for name, count in (inventory or {}).items()}
+    excluded = {name.lower() for name in exclude}
+    groups = {}
+    for item in items:
+        name = item['name'].lower()
+        hearts = item.get('hearts_recovered')
+        if name in excluded or not hearts or hearts <= 0 or inventory.get(name, 1) <= 0:
+            continue
+        groups.setdefault(hearts, []).append(item)
+
+    result = []
+    for hearts, group in sorted(groups.items()):
+        counts = [inventory.get(item['name'].lower()) for item in group]
+        result.append((hearts, group, None if None in counts else sum(counts)))
+    return result
+
+
+def assign_group_copies(group, copies, inventory):
+    """Spreads < copies > of a heart-value group over its items, respecting inventory."""
+
+    inventory = {name.lower(): count for name, count in (inventory or {}).items()}
+    combo = []
+    for item in group:
+        take = min(copies, inventory.get(item['name'].lower(), copies))
+        combo.extend([item] * take)
+        copies -= take
+        if not copies:
+            break
+    return combo
+
+
+def find_heart_combinations(hearts_needed, items, exact=False, max_items=None, inventory=None,
+                            exclude=(), top_k=1):
+    """Extended heart recovery solver. Returns up to < top_k > distinct combinations ranked
+    by hearts recovered (closest to < hearts_needed > first) and then by number of items.
+    Items with the same heart value are interchangeable, so alternatives differ in the
+    heart values they use.
+
+    Parameters:
+        hearts_needed (float): number of hearts to recover
+        items (list): item dictionaries with 'name' and 'hearts_recovered'
+        exact (bool): only accept combinations totalling exactly < hearts_needed >;
+                      otherwise any total up to < hearts_needed > is accepted
+        max_items (int|None): maximum number of items in a combination
+        inventory (dict|None): maps item names to the number of copies available; items
+                               not listed are unlimited (bounded knapsack)
+        exclude (iterable): names of items that must not be used
+        top_k (int): number of combinations to return
+
+    Returns:
+        list: combinations (lists of items), best first; empty if none is valid
+    """
+
+    if hearts_needed < 0 or top_k < 1:
+        return []
+    groups = group_heart_items(items, inventory, exclude)
+    values, target, divisor = scale_hearts([{'hearts_recovered': hearts} for hearts, _, _ in groups], hearts_needed)
+    if exact and not is_scaled_exactly(hearts_needed, target, divisor):
+        return []
+    limits = [limit for _, _, limit in groups]
+    min_counts, max_counts = solve_prefix_tables(values, limits, target)
+    cap = UNREACHABLE if max_items is None else max_items
+
+    def enumerate_copies(i, remaining, count, budget):
+        # Yields copies per group (for groups 0..i-1) totalling < remaining > with exactly
+        # < budget > items; the prefix tables prune every branch that cannot get there.
+        if i == 0:
+            yield []
+            return
+        value, limit = values[i - 1], limits[i - 1]
+        most = remaining // value if limit is None else min(limit, remaining // value)
+        for copies in range(most, -1, -1):
+            rest = remaining - copies * value
+            needed = budget - count - copies
+            if min_counts[i - 1, rest] <= needed <= max_counts[i - 1, rest]:
+                for chosen in enumerate_copies(i - 1, rest, count + copies, budget):
+                    yield chosen + [copies]
+
+    totals = [target] if exact else range(target, 0, -1)
+    combos = []
+    for total in totals:
+        fewest, most = int(min_counts[-1, total]), int(max_counts[-1, total])
+        for budget in range(fewest, min(most, cap) + 1):
+            for chosen in enumerate_copies(len(values), total, 0, budget):
+                combo = []
+                for (_, group, _), copies in zip(reversed(groups), reversed(chosen)):
+                    combo.extend(assign_group_copies(group, copies, inventory))
+                combos.append(combo)
+                if len(combos) == top_k:
+                    return combos
+    return combos
+
+
+HeartTableState = namedtuple('HeartTableState', 'mtime items unique_items values divisor counts back_item back_step best_total')
+
+
+class HeartTable:
+    """Precomputed minimal heart combinations for every target up to < ceiling > hearts.
+    The items in < filepath > are loaded once and a single DP pass (see
+    < solve_heart_table >) answers every smaller query by table lookup. The table is
+    rebuilt when the file's modification time changes, and it can be persisted to an
+    .npz file at < table_filepath > so restarts skip the DP.
+
+    The items and tables are published together as one immutable < HeartTableState >, so
+    a query running during a rebuild reads either the old or the new state, never a mix.
+
+    Parameters:
+        filepath (str): path to the hearts index, e.g. 'hearts_recovered_entries.json'
+        ceiling (float): largest target, in hearts, covered by the table
+        table_filepath (str|None): optional path used to persist the table
+    """
+
+    def __init__(self, filepath=HEARTS_FILEPATH, ceiling=HEART_TABLE_CEILING, table_filepath=HEART_TABLE_FILEPATH):
+        self.filepath = filepath
+        self.ceiling = ceiling
+        self.table_filepath = table_filepath
+        self.state = None
+        self._lock = threading.Lock()
+
+    def combination(self, hearts_needed, exact=False):
+        """Returns the same result as < find_minimal_heart_combination > for the items in
+        < filepath >. Targets above < ceiling > are solved directly, so user input is bounded
+        by the callers (see < check_hearts_needed >), not here.
+        """
+
+        state = self.refresh()
+        if hearts_needed < 0:
+            return None
+        if hearts_needed > self.ceiling:
+            with metrics.SOLVE_DURATION.time(solver='direct'):
+                return find_minimal_heart_combination(hearts_needed, state.items, exact=exact)
+
+        target = scale_target(hearts_needed, state.divisor)
+        if exact:
+            if not is_scaled_exactly(hearts_needed, target, state.divisor) or state.counts[target] >= UNREACHABLE:
+                return None
+            total = target
+        else:
+            total = int(state.best_total[target])
+        return reconstruct_heart_combination(state.unique_items, state.values, state.back_item, state.back_step, total)
+
+    def refresh(self):
+        """Reloads the items and rebuilds the table if the source file changed.
+
+        Returns:
+            HeartTableState: the current items and tables
+        """
+
+        mtime = os.stat(self.filepath).st_mtime_ns
+        state = self.state
+        if state is not None and state.mtime == mtime:
+            return state
+        with self._lock:
+            state = self.state
+            if state is not None and state.mtime == mtime:
+                return state
+            items = list(read_json(self.filepath).values())
+            unique_items = dedupe_by_hearts(items)
+            values, target, divisor = scale_hearts(unique_items, self.ceiling)
+            tables = self._load_table(mtime, values, target)
+            if tables is None:
+                with metrics.SOLVE_DURATION.time(solver='table_build'):
+                    tables = solve_heart_table(values, target)
+                if self.table_filepath:
+                    self._save_table(mtime, values, tables)
+            counts, back_item, back_step = tables
+            reachable = np.where(counts < UNREACHABLE, np.arange(target + 1), 0)
+            self.state = HeartTableState(mtime, items, unique_items, values, divisor, counts, back_item, back_step,
+                                         np.maximum.accumulate(reachable))
+            return self.state
+
+    def _load_table(self, mtime, values, target):
+        if not self.table_filepath:
+            return None
+        try:
+            with np.load(self.table_filepath) as saved:
+                if int(saved['source_mtime']) != mtime or len(saved['counts']) != target + 1 \
+                        or saved['values'].tolist() != values:
+                    return None
+                return saved['counts'], saved['back_item'], saved['back_step']
+        except (FileNotFoundError, KeyError, ValueError):
+            return None
+
+    def _save_table(self, mtime, values, tables):
+        counts, back_item, back_step = tables
+        tmp_filepath = f"{self.table_filepath}.tmp.npz"
+        np.savez(tmp_filepath, source_mtime=mtime, values=np.array(values), counts=counts,
+                 back_item=back_item, back_step=back_step)
+        os.replace(tmp_filepath, self.table_filepath)
+
+
+heart_table = HeartTable()
+
+
+def describe_combination(combo):
+    combo_str = ' + '.join(f"{item['name']}({item['hearts_recovered']})" for item in combo)
+    total_hearts = sum(item['hearts_recovered'] for item in combo)
+    return combo_str + f" = {total_hearts} hearts"
 
-    return None
 
 def perform_local_analysis(hearts_needed):
-    with open('hearts_recovered_entries.json', 'r') as file:
-        items_data = json.load(file)
-    items = list(items_data.values())
-    best_combo = find_minimal_heart_combination(hearts_needed, items)
+    best_combo = heart_table.combination(hearts_needed)
 
     if best_combo:
-        combo_str = ' + '.join(f"{item['name']}({item['hearts_recovered']})" for item in best_combo)
-        total_hearts = sum(item['hearts_recovered'] for item in best_combo)
-        combo_str += f" = {total_hearts} hearts"
-        return combo_str, best_combo
+        return describe_combination(best_combo), best_combo
     else:
         return "No combination found", None
 
+
+def perform_heart_query(hearts_needed, **options):
+    """Runs < find_heart_combinations > over the items in the shared < heart_table >.
+    Raises ValueError for targets rejected by < check_hearts_needed >.
+
+    Parameters:
+        hearts_needed (float): number of hearts to recover
+        options: keyword arguments accepted by < find_heart_combinations >
+
+    Returns:
+        list: (description, combination) tuples, best first
+    """
+
+    check_hearts_needed(hearts_needed)
+    items = heart_table.refresh().items
+    with metrics.SOLVE_DURATION.time(solver='query'):
+        combos = find_heart_combinations(hearts_needed, items, **options)
+    return [(describe_combination(combo), combo) for combo in combos if combo]
+
 # # Example usage
 # hearts_needed = 5  # You can change this value for testing
 # combo_str, combo_items = perform_local_analysis(hearts_needed)